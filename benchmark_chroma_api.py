@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+In-process microbenchmarks for the ChromaDB API bridge
+
+Builds a throwaway fixture collection from the enriched Telegram export,
+embeds it with the deterministic local `hashed` backend (no network, no
+API key) and drives the bridge's endpoint functions directly. Every
+request's per-stage timings (embed, query, hydration, serialization, ...)
+are captured, along with the per-record load work (JSON parse, model
+build, fragment encode) and the memory allocated per request.
+
+Results are written as JSON so runs from different commits can be
+compared:
+
+    python benchmark_chroma_api.py --output bench/main.json
+    python benchmark_chroma_api.py --baseline bench/main.json --fail-over 20
+"""
+
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+import click
+import numpy as np
+
+FIXTURE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data_ingestion", "tele_extracted_enriched.json")
+FIXTURE_COLLECTION = "benchmark_activities"
+
+# Free-text parts of the test_chroma_api.py preference profiles
+QUERIES = [
+    "romantic dinner date with creative twist",
+    "Chill activities for introverts under $30",
+    "luxury experiences and fine dining",
+    "family-friendly weekend activities with kids",
+    "adventurous outdoor activities",
+    "cultural experiences and art exhibitions",
+    "rooftop bars with a view",
+    "cheap eats near the city centre"
+]
+
+SCENARIOS = ("vector", "vector_filtered", "hybrid", "keyword", "diverse", "preferences", "nearby")
+
+
+def percentiles(samples) -> dict:
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples, dtype=np.float64) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 4),
+        "p50_ms": round(float(np.percentile(values, 50)), 4),
+        "p95_ms": round(float(np.percentile(values, 95)), 4),
+        "p99_ms": round(float(np.percentile(values, 99)), 4)
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def build_fixture(db_path: str, fixture_path: str, dimensions: int) -> int:
+    """Load the fixture records into a fresh collection embedded with the hashed backend"""
+    import chromadb
+    from chromadb_admin import document_text
+    from embedding_backends import HashedNgramBackend
+    from filter_fields import filter_metadata
+
+    with open(fixture_path) as handle:
+        records = json.load(handle)
+
+    backend = HashedNgramBackend(dimensions=dimensions)
+    # Stored the way backfill-filters leaves them, so the chroma engine can filter
+    metadatas = [
+        {"full_data": json.dumps(record), "title": record.get("title", ""), **filter_metadata(record)}
+        for record in records
+    ]
+    documents = [document_text(None, metadata) for metadata in metadatas]
+
+    collection = chromadb.PersistentClient(path=db_path).create_collection(
+        name=FIXTURE_COLLECTION,
+        embedding_function=None,
+        configuration={"hnsw": {"space": "l2"}}
+    )
+    for start in range(0, len(records), 500):
+        collection.add(
+            ids=[f"act_{i}" for i in range(start, min(start + 500, len(records)))],
+            embeddings=backend.embed(documents[start:start + 500]),
+            documents=documents[start:start + 500],
+            metadatas=metadatas[start:start + 500]
+        )
+    return collection.count()
+
+
+def make_request(api, scenario: str, query: str):
+    if scenario == "vector":
+        return api.search_activities, api.SearchRequest(query=query, n_results=15)
+    if scenario == "vector_filtered":
+        filters = api.SearchFilters(max_price=50, offer_type=["activity", "event", "deal"])
+        return api.search_activities, api.SearchRequest(query=query, n_results=15, filters=filters)
+    if scenario == "hybrid":
+        return api.search_activities, api.SearchRequest(query=query, n_results=15, mode="hybrid")
+    if scenario == "keyword":
+        return api.search_activities, api.SearchRequest(query=query, n_results=15, mode="keyword")
+    if scenario == "diverse":
+        return api.search_activities, api.SearchRequest(query=query, n_results=15, diversity=0.3)
+    if scenario == "preferences":
+        request = api.PreferenceSearchRequest(
+            query=query, activities=["Cafes", "Museums"], budget=2, numPax="date", mbti="ENFP", n_results=15
+        )
+        return api.search_activities_by_preferences, request
+    if scenario == "nearby":
+        request = api.NearbySearchRequest(query=query, latitude=1.2903, longitude=103.8520, radius_km=3.0, n_results=15)
+        return api.search_activities_nearby, request
+    raise click.BadParameter(f"Unknown scenario: {scenario}")
+
+
+def benchmark_load(api) -> dict:
+    """Per-record cost of the work the activity store does once per load"""
+    page = api.collection.get(include=["metadatas"])
+    payloads = [metadata['full_data'] for metadata in page['metadatas'] if metadata and 'full_data' in metadata]
+
+    stages = {"json_parse": [], "model_build": [], "fragment_encode": []}
+    for payload in payloads:
+        started_at = time.perf_counter()
+        full_data = json.loads(payload)
+        parsed_at = time.perf_counter()
+        activity = api.activity_from_data(full_data)
+        built_at = time.perf_counter()
+        api.encode_activity(activity)
+        encoded_at = time.perf_counter()
+        stages["json_parse"].append(parsed_at - started_at)
+        stages["model_build"].append(built_at - parsed_at)
+        stages["fragment_encode"].append(encoded_at - built_at)
+
+    started_at = time.perf_counter()
+    api.activity_store.load()
+    return {
+        "records": len(payloads),
+        "stages": {stage: percentiles(samples) for stage, samples in stages.items()},
+        "store_load_ms": round((time.perf_counter() - started_at) * 1000, 2)
+    }
+
+
+async def run_scenario(api, scenario: str, iterations: int, warmup: int, track_allocations: bool) -> dict:
+    observations = []
+    observe = api.metrics.stage_seconds.observe
+
+    def recording_observe(label, seconds):
+        observations.append((label, seconds))
+        observe(label, seconds)
+
+    api.metrics.stage_seconds.observe = recording_observe
+    try:
+        for i in range(warmup):
+            endpoint, request = make_request(api, scenario, QUERIES[i % len(QUERIES)])
+            await endpoint(request)
+
+        stage_samples = {}
+        totals = []
+        for i in range(iterations):
+            endpoint, request = make_request(api, scenario, QUERIES[i % len(QUERIES)])
+            observations.clear()
+            started_at = time.perf_counter()
+            await endpoint(request)
+            totals.append(time.perf_counter() - started_at)
+
+            per_request = {}
+            for label, seconds in observations:
+                per_request[label] = per_request.get(label, 0.0) + seconds
+            for label, seconds in per_request.items():
+                stage_samples.setdefault(label, []).append(seconds)
+    finally:
+        api.metrics.stage_seconds.observe = observe
+
+    result = {
+        "total": percentiles(totals),
+        "stages": {stage: percentiles(samples) for stage, samples in sorted(stage_samples.items())}
+    }
+
+    if track_allocations:
+        # Separate pass: tracing slows every allocation and would skew timings
+        peaks, retained = [], []
+        tracemalloc.start()
+        try:
+            for i in range(iterations):
+                endpoint, request = make_request(api, scenario, QUERIES[i % len(QUERIES)])
+                tracemalloc.reset_peak()
+                before, _ = tracemalloc.get_traced_memory()
+                await endpoint(request)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                retained.append(current - before)
+        finally:
+            tracemalloc.stop()
+        result["allocations"] = {
+            "peak_kib_p50": round(float(np.percentile(peaks, 50)) / 1024, 2),
+            "peak_kib_p95": round(float(np.percentile(peaks, 95)) / 1024, 2),
+            "peak_kib_max": round(max(peaks) / 1024, 2),
+            "retained_kib_mean": round(float(np.mean(retained)) / 1024, 2)
+        }
+
+    return result
+
+
+def compare(results: dict, baseline: dict, fail_over: float) -> list:
+    """Print p50/p95 changes against a baseline run and return scenarios that regressed"""
+    regressions = []
+    print(f"\n📊 Compared with {baseline['meta'].get('commit', '?')} ({baseline['meta'].get('timestamp', '?')})")
+    print(f"   {'scenario':<18}{'p50 ms':>10}{'Δ':>9}{'p95 ms':>10}{'Δ':>9}")
+    for scenario, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(scenario)
+        if not previous:
+            print(f"   {scenario:<18}{current['total']['p50_ms']:>10.3f}{'new':>9}{current['total']['p95_ms']:>10.3f}{'new':>9}")
+            continue
+        changes = {}
+        for key in ("p50_ms", "p95_ms"):
+            before = previous["total"][key]
+            changes[key] = (current["total"][key] - before) / before * 100 if before else 0.0
+        print(
+            f"   {scenario:<18}{current['total']['p50_ms']:>10.3f}{changes['p50_ms']:>+8.1f}%"
+            f"{current['total']['p95_ms']:>10.3f}{changes['p95_ms']:>+8.1f}%"
+        )
+        if fail_over is not None and changes["p95_ms"] > fail_over:
+            regressions.append(scenario)
+    return regressions
+
+
+@click.command()
+@click.option("--iterations", default=200, help="Timed requests per scenario")
+@click.option("--warmup", default=20, help="Untimed requests per scenario before timing")
+@click.option("--scenario", "scenarios", multiple=True, type=click.Choice(SCENARIOS),
+              help="Scenarios to run (default: all)")
+@click.option("--fixture", default=FIXTURE_PATH, help="JSON list of activities to load into the fixture collection")
+@click.option("--dimensions", default=384, help="Hashed embedding size")
+@click.option("--engine", default="auto", type=click.Choice(["auto", "numpy", "chroma"]), help="VECTOR_ENGINE to benchmark")
+@click.option("--quantization", default="none", type=click.Choice(["none", "int8", "binary"]), help="VECTOR_QUANTIZATION for the numpy engine")
+@click.option("--embedding-cache/--no-embedding-cache", default=False,
+              help="Keep the query embedding cache on (off times every embed)")
+@click.option("--allocations/--no-allocations", default=True, help="Measure allocations per request with tracemalloc")
+@click.option("--output", default="benchmark_results.json", help="Where to write the JSON results")
+@click.option("--baseline", default=None, help="Earlier results JSON to compare against")
+@click.option("--fail-over", type=float, default=None, help="Exit non-zero if any scenario's p95 regressed by more than this percent")
+def main(iterations, warmup, scenarios, fixture, dimensions, engine, quantization, embedding_cache,
+         allocations, output, baseline, fail_over):
+    """Benchmark the bridge's search hot path in-process."""
+    db_path = tempfile.mkdtemp(prefix="chromadb-bench-")
+    try:
+        print(f"🧪 Building fixture collection from {fixture}")
+        count = build_fixture(db_path, fixture, dimensions)
+        print(f"   {count} activities embedded with hashed-ngram-{dimensions}")
+
+        # The bridge reads its configuration at import time
+        os.environ.update({
+            "EMBEDDING_BACKEND": "hashed",
+            "EMBEDDING_DIMENSIONS": str(dimensions),
+            "CHROMA_DB_PATH": db_path,
+            "CHROMA_COLLECTION": FIXTURE_COLLECTION,
+            "STARTUP_MODE": "blocking",
+            "WARMUP_QUERIES": QUERIES[0],
+            "EMBEDDING_CACHE_SIZE": "1024" if embedding_cache else "0",
+            "EMBEDDING_STORE_PATH": "",
+            "RESPONSE_CACHE_MAX_BYTES": "0",
+            "RESPONSE_CACHE_DIR": "",
+            "SEMANTIC_CACHE_SIZE": "0",
+            "VECTOR_ENGINE": engine,
+            "VECTOR_QUANTIZATION": quantization,
+            # The fixture's offers age; keep every one so runs stay comparable
+            "DROP_EXPIRED_OFFERS": "false",
+            "EXPIRY_SWEEP_SECONDS": "0",
+            "HOT_SWAP_CHECK_SECONDS": "0",
+            "COLLECTION_MANIFEST": os.path.join(db_path, "collection_manifest.json")
+        })
+        import chromadb_api as api
+
+        api.initialize()
+
+        results = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "python": platform.python_version(),
+                "numpy": np.__version__,
+                "machine": platform.machine(),
+                "activities": count,
+                "embedding_model": api.embedding_model,
+                "vector_engine": api.activity_store.vector_engine_stats(),
+                "iterations": iterations,
+                "embedding_cache": embedding_cache
+            },
+            "load": benchmark_load(api),
+            "scenarios": {}
+        }
+
+        for scenario in scenarios or SCENARIOS:
+            result = asyncio.run(run_scenario(api, scenario, iterations, warmup, allocations))
+            results["scenarios"][scenario] = result
+            total = result["total"]
+            line = f"⏱️  {scenario:<16} p50 {total['p50_ms']:.3f}ms  p95 {total['p95_ms']:.3f}ms  p99 {total['p99_ms']:.3f}ms"
+            if "allocations" in result:
+                line += f"  peak {result['allocations']['peak_kib_p50']:.1f}KiB"
+            print(line)
+            for stage, stats in result["stages"].items():
+                print(f"      {stage:<16} p50 {stats['p50_ms']:.3f}ms  p95 {stats['p95_ms']:.3f}ms")
+
+        for stage, stats in results["load"]["stages"].items():
+            print(f"📦 {stage:<18} p50 {stats['p50_ms'] * 1000:.1f}µs  p95 {stats['p95_ms'] * 1000:.1f}µs per record")
+
+        os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+        with open(output, "w") as handle:
+            json.dump(results, handle, indent=2)
+        print(f"\n💾 Results written to {output}")
+
+        if baseline:
+            with open(baseline) as handle:
+                regressions = compare(results, json.load(handle), fail_over)
+            if regressions:
+                raise click.ClickException(f"p95 regressed by more than {fail_over}% in: {', '.join(regressions)}")
+    finally:
+        shutil.rmtree(db_path, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
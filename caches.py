@@ -0,0 +1,419 @@
+"""
+Query, response and near-duplicate caches for the ChromaDB bridge
+
+Each cache is thread-safe, bounded and reports hits, misses and evictions
+through stats(). None of them touches ChromaDB or the embedding backend;
+callers pass in the vectors, ids and response bodies to keep.
+"""
+
+from collections import OrderedDict
+from typing import List, Optional
+import asyncio
+import hashlib
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+import numpy as np
+from pydantic import BaseModel
+
+from reranking import unit_rows
+
+
+class EmbeddingCache:
+    """
+    Thread-safe LRU cache for query embeddings with a time-to-live
+
+    Keys are (model name, normalized query text) so switching models never
+    serves a stale vector.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            embedding, stored_at = entry
+            if self.ttl_seconds > 0 and time.monotonic() - stored_at > self.ttl_seconds:
+                del self._entries[key]
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return embedding
+
+    def put(self, key, embedding):
+        if self.max_size <= 0:
+            return
+
+        with self._lock:
+            self._entries[key] = (embedding, time.monotonic())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class ResponseCache:
+    """
+    LRU cache of serialized JSON response bodies bounded by total bytes
+
+    Keys include the collection fingerprint and embedding model, so
+    re-indexed data or a different backend never serves an old response.
+    With a directory set, bodies are also written to disk and survive
+    restarts. One background thread does every disk write: it persists
+    bodies, prunes directories for superseded fingerprints, and deletes
+    the oldest files once the directory outgrows disk_max_bytes. Workers
+    sharing the directory only see each other's files when they rescan,
+    so the budget is approximate with several workers.
+    """
+
+    def __init__(self, max_bytes: int, directory: Optional[str] = None, disk_max_bytes: int = 256 * 1024 * 1024,
+                 disk_evict_to: float = 0.9, write_queue_size: int = 1024, embedding_model: str = ""):
+        self.max_bytes = max_bytes
+        self.embedding_model = embedding_model
+        self.directory = directory
+        self.disk_max_bytes = disk_max_bytes
+        self.disk_evict_to = disk_evict_to
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._writes = queue.Queue(maxsize=write_queue_size)
+        self._writer = None
+        self._disk_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_evictions = 0
+        self.dropped_writes = 0
+
+    def key(self, endpoint: str, request: BaseModel, fingerprint: str) -> tuple:
+        payload = json.dumps(request.model_dump(mode="json"), sort_keys=True)
+        digest = hashlib.sha256(f"{endpoint}|{self.embedding_model}|{payload}".encode("utf-8")).hexdigest()
+        return fingerprint, digest
+
+    def _path(self, key: tuple) -> str:
+        fingerprint, digest = key
+        return os.path.join(self.directory, fingerprint[:16], f"{digest}.json")
+
+    def _remember(self, key: tuple, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= len(previous)
+            self._entries[key] = body
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted)
+                self.evictions += 1
+
+    def _get_memory(self, key: tuple) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return body
+
+    def _get_disk(self, key: tuple) -> Optional[bytes]:
+        body = None
+        if self.directory:
+            try:
+                with open(self._path(key), "rb") as f:
+                    body = f.read()
+            except OSError:
+                body = None
+            if body is not None:
+                self._remember(key, body)
+        with self._lock:
+            if body is not None:
+                self.disk_hits += 1
+            else:
+                self.misses += 1
+        return body
+
+    def get(self, key: tuple) -> Optional[bytes]:
+        """Cached body from memory, else from disk (blocking)"""
+        body = self._get_memory(key)
+        return body if body is not None else self._get_disk(key)
+
+    async def lookup(self, key: tuple) -> Optional[bytes]:
+        """Cached body for an async handler; only a disk read leaves the event loop"""
+        body = self._get_memory(key)
+        if body is not None:
+            return body
+        if not self.directory:
+            return self._get_disk(key)
+        return await asyncio.to_thread(self._get_disk, key)
+
+    def _enqueue(self, task: tuple):
+        with self._lock:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="response-cache-writer", daemon=True)
+                self._writer.start()
+        try:
+            self._writes.put_nowait(task)
+        except queue.Full:
+            # The disk is falling behind; the body is still cached in memory
+            with self._lock:
+                self.dropped_writes += 1
+
+    def put(self, key: tuple, body: bytes):
+        if self.max_bytes <= 0:
+            return
+        self._remember(key, body)
+        if self.directory and self.disk_max_bytes > 0 and len(body) <= self.disk_max_bytes:
+            self._enqueue(("write", key, body))
+
+    def prune(self, fingerprint: str):
+        """Drop on-disk entries written for any other collection fingerprint (in the background)"""
+        if self.directory:
+            self._enqueue(("prune", fingerprint, None))
+
+    def _write_loop(self):
+        self._disk_bytes = self._trim_disk(self.disk_max_bytes)
+        while True:
+            action, key, body = self._writes.get()
+            try:
+                if action == "prune":
+                    self._prune_disk(key)
+                else:
+                    self._write_disk(key, body)
+            except OSError as e:
+                print(f"⚠️ Response cache disk {action} failed: {e}")
+
+    def _write_disk(self, key: tuple, body: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename so concurrent readers never see a partial file
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+        self._disk_bytes += len(body)
+        if self._disk_bytes > self.disk_max_bytes:
+            self._disk_bytes = self._trim_disk(int(self.disk_max_bytes * self.disk_evict_to))
+
+    def _prune_disk(self, fingerprint: str):
+        if not os.path.isdir(self.directory):
+            return
+        for name in os.listdir(self.directory):
+            if name != fingerprint[:16]:
+                shutil.rmtree(os.path.join(self.directory, name), ignore_errors=True)
+        self._disk_bytes = self._trim_disk(self.disk_max_bytes)
+
+    def _trim_disk(self, target_bytes: int) -> int:
+        """Rescan the directory and delete the oldest files until it fits target_bytes; returns the bytes left"""
+        if not os.path.isdir(self.directory):
+            return 0
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                path = os.path.join(root, name)
+                try:
+                    info = os.stat(path)
+                except OSError:
+                    continue
+                files.append((info.st_mtime, info.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        if total <= target_bytes:
+            return total
+        for _, size, path in sorted(files):
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            with self._lock:
+                self.disk_evictions += 1
+            if total <= target_bytes:
+                break
+        return total
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.disk_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "directory": self.directory,
+                "disk_bytes": self._disk_bytes if self.directory else None,
+                "disk_max_bytes": self.disk_max_bytes if self.directory else None,
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "disk_evictions": self.disk_evictions,
+                "dropped_writes": self.dropped_writes,
+                "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0
+            }
+
+
+class SemanticCache:
+    """
+    Near-duplicate query cache over (query embedding, result ids) pairs
+
+    Preference-built queries differ by a trait or a tag from user to user,
+    so exact-match keys rarely repeat. Entries live in a fixed-size matrix
+    of unit query vectors; a new query within max_distance (cosine) of a
+    cached one under the same filters and collection fingerprint reuses its
+    ids and skips the collection query. With rerank set, entries keep an
+    over-fetched candidate pool with its embeddings, and hits re-rank that
+    pool against the new query so the tail follows the actual query.
+    """
+
+    def __init__(self, max_entries: int, max_distance: float, rerank: bool, candidate_multiplier: int):
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.rerank = rerank
+        self.candidate_multiplier = candidate_multiplier if rerank else 1
+        self._vectors = None
+        self._entries = [None] * max_entries
+        self._partitions = np.full(max_entries, -1, dtype=np.int64)
+        self._last_used = np.zeros(max_entries, dtype=np.int64)
+        self._partition_ids = {}
+        self._next_partition = 0
+        self._fingerprint = None
+        self._clock = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0 and self.max_distance > 0
+
+    def fetch_size(self, n_results: int) -> int:
+        """How many candidates to fetch on a miss so later hits can re-rank"""
+        return n_results * self.candidate_multiplier
+
+    def _partition(self, where: Optional[dict], fingerprint: str, create: bool) -> Optional[int]:
+        if fingerprint != self._fingerprint:
+            # The collection changed, so every cached id list is suspect
+            self._entries = [None] * self.max_entries
+            self._partitions.fill(-1)
+            self._partition_ids = {}
+            self._fingerprint = fingerprint
+        key = json.dumps(where, sort_keys=True)
+        if key not in self._partition_ids and create:
+            if len(self._partition_ids) >= self.max_entries:
+                # Forget where clauses whose entries have all been evicted; live ones fit in max_entries
+                live = set(self._partitions[self._partitions >= 0].tolist())
+                self._partition_ids = {
+                    where_key: partition for where_key, partition in self._partition_ids.items() if partition in live
+                }
+            self._partition_ids[key] = self._next_partition
+            self._next_partition += 1
+        return self._partition_ids.get(key)
+
+    def get(self, embedding, n_results: int, where: Optional[dict], fingerprint: str) -> Optional[List[str]]:
+        if not self.enabled:
+            return None
+
+        query = unit_rows(np.asarray([embedding], dtype=np.float32))[0]
+        with self._lock:
+            partition = self._partition(where, fingerprint, create=False)
+            if partition is None or self._vectors is None:
+                self.misses += 1
+                return None
+
+            similarity = self._vectors @ query
+            similarity[self._partitions != partition] = -np.inf
+            match = None
+            for slot in np.argsort(-similarity):
+                if 1.0 - similarity[slot] > self.max_distance:
+                    break
+                ids, embeddings, exhaustive = self._entries[slot]
+                if len(ids) >= n_results or exhaustive:
+                    match = slot
+                    break
+
+            if match is None:
+                self.misses += 1
+                return None
+            self._clock += 1
+            self._last_used[match] = self._clock
+            self.hits += 1
+
+        if embeddings is not None:
+            order = np.argsort(-(unit_rows(embeddings) @ query), kind="stable")
+            ids = [ids[i] for i in order]
+        return ids[:n_results]
+
+    def put(self, embedding, ids: List[str], embeddings, fetched: int, where: Optional[dict], fingerprint: str):
+        if not self.enabled:
+            return
+
+        query = unit_rows(np.asarray([embedding], dtype=np.float32))[0]
+        with self._lock:
+            partition = self._partition(where, fingerprint, create=True)
+            if self._vectors is None:
+                self._vectors = np.zeros((self.max_entries, len(query)), dtype=np.float32)
+
+            free = np.flatnonzero(self._partitions < 0)
+            if len(free):
+                slot = int(free[0])
+            else:
+                slot = int(np.argmin(self._last_used))
+                self.evictions += 1
+
+            self._clock += 1
+            self._vectors[slot] = query
+            self._partitions[slot] = partition
+            self._last_used[slot] = self._clock
+            self._entries[slot] = (
+                list(ids),
+                np.asarray(embeddings, dtype=np.float32) if self.rerank and embeddings is not None else None,
+                # Fewer hits than asked for means the filters matched nothing more
+                len(ids) < fetched
+            )
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": int((self._partitions >= 0).sum()),
+                "max_size": self.max_entries,
+                "max_distance": self.max_distance,
+                "partitions": len(self._partition_ids),
+                "rerank": self.rerank,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,369 @@
+#!/usr/bin/env python3
+"""
+ChromaDB bridge admin CLI
+
+Maintenance commands for the collections served by chromadb_api.py.
+"""
+
+from collections import Counter
+from datetime import datetime
+import json
+import os
+import re
+import time
+
+import chromadb
+from chromadb.errors import NotFoundError
+import click
+from dotenv import load_dotenv
+
+from embedding_backends import create_embedding_backend, default_collection_name
+from filter_fields import stale_filter_fields
+from offer_dates import configured_timezone, date_ordinal
+
+# Load environment variables the same way the bridge does
+load_dotenv('.env.local')
+load_dotenv()
+
+
+# Query lines the bridge prints for /search, /search/preferences and /search/nearby
+BRIDGE_QUERY_LOG = re.compile(r"(?:Searching for|Preference search for|Nearby search for): '(.*)' \(top \d+")
+
+
+def get_client(db_path: str):
+    return chromadb.PersistentClient(path=db_path)
+
+
+def bridge_collection_name() -> str:
+    """The collection the bridge serves: the published one, else its configured one"""
+    try:
+        with open(os.getenv("COLLECTION_MANIFEST", "./data/collection_manifest.json")) as handle:
+            published = json.load(handle).get("collection")
+    except FileNotFoundError:
+        published = None
+    backend = os.getenv("EMBEDDING_BACKEND", "openai")
+    return published or os.getenv("CHROMA_COLLECTION", default_collection_name(backend))
+
+
+def logged_queries(lines, log_format: str):
+    """Query texts from bridge log output, JSON lines with a query field, or one query per line"""
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if log_format == "bridge":
+            match = BRIDGE_QUERY_LOG.search(line)
+            query = match.group(1) if match else None
+        elif log_format == "jsonl":
+            try:
+                query = json.loads(line).get("query")
+            except (ValueError, AttributeError):
+                query = None
+        else:
+            query = line
+        if query and query.strip():
+            yield query
+
+
+def document_text(document, metadata) -> str:
+    """Text to embed for a record, falling back to full_data when no document is stored"""
+    if document:
+        return document
+
+    full_data = json.loads((metadata or {}).get('full_data') or '{}')
+    return " ".join(filter(None, [
+        full_data.get('title'),
+        full_data.get('description'),
+        full_data.get('search_keywords')
+    ]))
+
+
+@click.group()
+def cli():
+    """ChromaDB bridge admin commands"""
+    pass
+
+
+@cli.command()
+@click.option("--backend", required=True, help="Embedding backend to embed with (openai, hashed)")
+@click.option("--dimensions", type=int, default=None, help="Vector size for backends that support it")
+@click.option("--source", default="telegram_activities", help="Collection to read records from")
+@click.option("--target", default=None, help="Collection to write (defaults to the backend's collection)")
+@click.option("--db-path", default=lambda: os.getenv("CHROMA_DB_PATH", "./data/chroma_db"),
+              help="ChromaDB directory")
+@click.option("--batch-size", default=100, help="Records embedded per call")
+def reembed(backend, dimensions, source, target, db_path, batch_size):
+    """Re-embed every record of a collection with the chosen backend."""
+    try:
+        embedding_backend = create_embedding_backend(
+            backend,
+            api_key=os.getenv("OPENAI_API_KEY"),
+            dimensions=dimensions
+        )
+        target = target or default_collection_name(backend)
+        if target == source:
+            raise click.BadParameter("target must differ from source", param_hint="--target")
+
+        client = get_client(db_path)
+        source_collection = client.get_collection(name=source)
+        total = source_collection.count()
+        print(f"📥 Re-embedding {total} records from '{source}' into '{target}'")
+        print(f"🧠 Backend: {embedding_backend.name} ({embedding_backend.model_name})")
+
+        # Built under a staging name so a failed run leaves the existing target untouched
+        staging = f"{target}_reembed_{int(time.time())}"
+
+        # Keep the source's distance metric so scores stay comparable
+        space = (source_collection.configuration.get("hnsw") or {}).get("space", "l2")
+        target_collection = client.create_collection(
+            name=staging,
+            embedding_function=None,
+            configuration={"hnsw": {"space": space}},
+            metadata={"embedding_backend": embedding_backend.name, "embedding_model": embedding_backend.model_name}
+        )
+
+        try:
+            offset = 0
+            while offset < total:
+                page = source_collection.get(
+                    include=["documents", "metadatas"],
+                    limit=batch_size,
+                    offset=offset
+                )
+                if not page['ids']:
+                    break
+
+                texts = [
+                    document_text(document, metadata)
+                    for document, metadata in zip(page['documents'], page['metadatas'])
+                ]
+                target_collection.add(
+                    ids=page['ids'],
+                    embeddings=embedding_backend.embed(texts),
+                    documents=texts,
+                    metadatas=page['metadatas']
+                )
+                offset += len(page['ids'])
+                print(f"   {offset}/{total}")
+        except BaseException:
+            client.delete_collection(staging)
+            raise
+
+        try:
+            client.delete_collection(target)
+            print(f"🗑️  Replaced existing collection '{target}'")
+        except NotFoundError:
+            pass
+        target_collection.modify(name=target)
+
+        print(f"\n✅ Re-embedded {target_collection.count()} records")
+        print(f"   Serve it with: EMBEDDING_BACKEND={backend} python chromadb_api.py")
+        print("   Bridges already serving it must restart; to swap without one, --target a new name and publish it")
+
+    except Exception as e:
+        print(f"❌ Re-embed failed: {e}")
+        raise
+
+
+@cli.command("export-snapshot")
+@click.option("--collection", "collection_name", default=None,
+              help="Collection to export (defaults to the one the bridge serves)")
+@click.option("--output", default=lambda: os.getenv("SNAPSHOT_PATH", "./data/snapshot"),
+              help="Snapshot directory to write")
+@click.option("--db-path", default=lambda: os.getenv("CHROMA_DB_PATH", "./data/chroma_db"),
+              help="ChromaDB directory")
+def export_snapshot(collection_name, output, db_path):
+    """Export a collection as a memory-mapped snapshot for SERVING_MODE=snapshot."""
+    try:
+        # Imported here so the other commands do not need the bridge's embedding backend
+        import chromadb_api
+
+        collection_name = collection_name or bridge_collection_name()
+        source = get_client(db_path).get_collection(name=collection_name)
+        print(f"📤 Exporting {source.count()} records from '{collection_name}' to {output}")
+
+        manifest = chromadb_api.export_snapshot(source, output)
+
+        print(f"\n✅ Exported {manifest['count']} activities ({manifest['dimensions']} dims, {manifest['space']})")
+        print(f"   Serve it with: SERVING_MODE=snapshot SNAPSHOT_PATH={output} WEB_CONCURRENCY=4 python chromadb_api.py")
+
+    except Exception as e:
+        print(f"❌ Snapshot export failed: {e}")
+        raise
+
+
+@cli.command()
+@click.option("--collection", "collection_name", required=True, help="Collection the bridge should serve")
+@click.option("--manifest", default=lambda: os.getenv("COLLECTION_MANIFEST", "./data/collection_manifest.json"),
+              help="Collection manifest the bridge watches")
+@click.option("--db-path", default=lambda: os.getenv("CHROMA_DB_PATH", "./data/chroma_db"),
+              help="ChromaDB directory")
+def publish(collection_name, manifest, db_path):
+    """Point running bridges at a collection; they load and warm it, then swap it in."""
+    try:
+        count = get_client(db_path).get_collection(name=collection_name).count()
+        if count == 0:
+            raise click.ClickException(f"Collection '{collection_name}' is empty")
+
+        os.makedirs(os.path.dirname(os.path.abspath(manifest)), exist_ok=True)
+        # Write then rename so a bridge never reads a partial manifest
+        tmp_path = f"{manifest}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "collection": collection_name,
+                "count": count,
+                "published_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            }, f, indent=2)
+        os.replace(tmp_path, manifest)
+
+        print(f"✅ Published '{collection_name}' ({count} records) to {manifest}")
+        print("   Bridges swap it in on their next check (HOT_SWAP_CHECK_SECONDS)")
+
+    except Exception as e:
+        print(f"❌ Publish failed: {e}")
+        raise
+
+
+@cli.command()
+@click.option("--collection", "collection_name", default=None,
+              help="Collection to compact (defaults to the one the bridge serves)")
+@click.option("--as-of", type=click.DateTime(formats=["%Y-%m-%d"]), default=None,
+              help="Delete offers whose validity_end is before this date (defaults to today in EXPIRY_TIMEZONE)")
+@click.option("--db-path", default=lambda: os.getenv("CHROMA_DB_PATH", "./data/chroma_db"),
+              help="ChromaDB directory")
+@click.option("--batch-size", default=500, help="Records read or deleted per call")
+@click.option("--dry-run", is_flag=True, help="Report expired offers without deleting them")
+def compact(collection_name, as_of, db_path, batch_size, dry_run):
+    """Delete expired offers from a collection."""
+    try:
+        collection_name = collection_name or bridge_collection_name()
+        as_of = as_of.date() if as_of else datetime.now(configured_timezone()).date()
+        cutoff = date_ordinal(as_of)
+        collection = get_client(db_path).get_collection(name=collection_name)
+        total = collection.count()
+        print(f"🔍 Checking {total} records in '{collection_name}' for offers that ended before {as_of}")
+
+        expired = []
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not page['ids']:
+                break
+            for activity_id, metadata in zip(page['ids'], page['metadatas']):
+                metadata = metadata or {}
+                ordinal = metadata.get('validity_end_ord')
+                if ordinal is None:
+                    # Filter fields are only there once backfill-filters has run
+                    try:
+                        ordinal = date_ordinal(json.loads(metadata['full_data']).get('validity_end'))
+                    except (KeyError, ValueError):
+                        ordinal = None
+                if ordinal is not None and ordinal < cutoff:
+                    expired.append(activity_id)
+            offset += len(page['ids'])
+
+        if dry_run:
+            print(f"\n🧪 Dry run: {len(expired)} of {total} records have expired")
+            return
+
+        for start in range(0, len(expired), batch_size):
+            collection.delete(ids=expired[start:start + batch_size])
+
+        print(f"\n✅ Deleted {len(expired)} expired offers, {collection.count()} records left")
+        if expired:
+            print("   Running bridges reload on their next change check; re-export snapshots to compact those too")
+
+    except Exception as e:
+        print(f"❌ Compaction failed: {e}")
+        raise
+
+
+@cli.command("backfill-filters")
+@click.option("--collection", "collection_name", default=None,
+              help="Collection to update (defaults to the one the bridge serves)")
+@click.option("--db-path", default=lambda: os.getenv("CHROMA_DB_PATH", "./data/chroma_db"),
+              help="ChromaDB directory")
+@click.option("--batch-size", default=500, help="Records read or updated per call")
+@click.option("--dry-run", is_flag=True, help="Report stale records without updating them")
+def backfill_filters(collection_name, db_path, batch_size, dry_run):
+    """Write flat filter metadata derived from full_data into a collection."""
+    try:
+        collection_name = collection_name or bridge_collection_name()
+        collection = get_client(db_path).get_collection(name=collection_name)
+        total = collection.count()
+        print(f"🔍 Checking {total} records in '{collection_name}' for missing or stale filter metadata")
+
+        stale = {}
+        offset = 0
+        while True:
+            page = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not page['ids']:
+                break
+            for activity_id, metadata in zip(page['ids'], page['metadatas']):
+                metadata = metadata or {}
+                try:
+                    update = stale_filter_fields(metadata, json.loads(metadata['full_data']))
+                except (KeyError, ValueError) as parse_error:
+                    print(f"⚠️ Skipping activity {activity_id}: {parse_error}")
+                    continue
+                if update:
+                    stale[activity_id] = update
+            offset += len(page['ids'])
+
+        if dry_run:
+            print(f"\n🧪 Dry run: {len(stale)} of {total} records need filter metadata")
+            return
+
+        ids = list(stale)
+        for start in range(0, len(ids), batch_size):
+            page_ids = ids[start:start + batch_size]
+            collection.update(ids=page_ids, metadatas=[stale[activity_id] for activity_id in page_ids])
+
+        print(f"\n✅ Backfilled filter metadata for {len(ids)} of {total} records")
+        if ids:
+            print("   Running bridges reload on their next change check")
+
+    except Exception as e:
+        print(f"❌ Backfill failed: {e}")
+        raise
+
+
+@cli.command("seed-embeddings")
+@click.argument("query_log", type=click.File("r"))
+@click.option("--format", "log_format", default="bridge", type=click.Choice(["bridge", "jsonl", "text"]),
+              help="bridge: the bridge's own log output; jsonl: objects with a query field; text: one query per line")
+@click.option("--store", default=lambda: os.getenv("EMBEDDING_STORE_PATH", "./data/embedding_store.db"),
+              help="Embedding store file to seed")
+@click.option("--limit", default=5000, help="Most frequent distinct queries to seed")
+@click.option("--batch-size", default=100, help="Queries embedded per call")
+def seed_embeddings(query_log, log_format, store, limit, batch_size):
+    """Pre-embed the most frequent queries of a query log into the persistent embedding store."""
+    try:
+        if not store:
+            raise click.BadParameter("an embedding store path is required", param_hint="--store")
+        # The bridge reads its configuration at import time
+        os.environ["EMBEDDING_STORE_PATH"] = store
+        import chromadb_api
+
+        if not chromadb_api.embedding_store.enabled:
+            raise click.ClickException(f"Embedding store at {store} could not be opened")
+
+        counts = Counter(chromadb_api.normalize_query(query) for query in logged_queries(query_log, log_format))
+        queries = [query for query, _ in counts.most_common(limit)]
+        print(f"📥 {sum(counts.values())} logged queries, seeding the top {len(queries)} of {len(counts)} distinct")
+        print(f"🧠 Model: {chromadb_api.embedding_model}, store: {store}")
+
+        for start in range(0, len(queries), batch_size):
+            chromadb_api.embed_queries(queries[start:start + batch_size])
+            print(f"   {min(start + batch_size, len(queries))}/{len(queries)}")
+
+        stats = chromadb_api.embedding_store.stats()
+        print(f"\n✅ {stats['writes']} queries embedded, {stats['hits']} were already stored ({stats['rows']} rows, {stats['bytes']} bytes)")
+
+    except Exception as e:
+        print(f"❌ Seeding failed: {e}")
+        raise
+
+
+if __name__ == "__main__":
+    cli()
@@ -2,23 +2,58 @@
 """
 FastAPI bridge for ChromaDB access from Next.js
 Runs alongside the Next.js server to provide ChromaDB query capabilities
+
+Configuration, the serving store and the endpoints live here; the caches,
+indexes, re-ranking and serving machinery they use are in caches.py,
+lexical.py, geo.py, reranking.py, serving.py and metrics.py.
 """
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field, model_validator
+from typing import Annotated, Dict, List, Literal, Optional
+from collections import OrderedDict
+from datetime import date
+from contextlib import asynccontextmanager
+import asyncio
 import chromadb
-from chromadb.utils import embedding_functions
+import hashlib
+import orjson
 import os
 import json
+import numpy as np
+import threading
+import time
 from dotenv import load_dotenv
+from caches import EmbeddingCache, ResponseCache, SemanticCache
+from embedding_backends import create_embedding_backend, default_collection_name
+from embedding_store import EmbeddingStore
+from filter_fields import filter_metadata, stale_filter_fields, tag_key
+from geo import GeoGridIndex, haversine_km
+from lexical import BM25Index, lexical_text, tokenize
+from metrics import Metrics, format_labels
+from offer_dates import NO_EXPIRY_ORDINAL, ExpiryIndex, configured_timezone, date_ordinal, today_ordinal
+from mmap_snapshot import MANIFEST_FILE, SnapshotCollection, write_snapshot
+from reranking import mmr_select, reciprocal_rank_fusion, unit_rows
+from serving import Readiness, SearchExecutor, SingleFlight, StoreSwapper
+from vector_engine import NumpyVectorIndex
 
 # Load environment variables from .env.local (development) or .env (production)
 load_dotenv('.env.local')  # For local development
 load_dotenv()  # For production
 
-app = FastAPI(title="ChromaDB API Bridge", version="1.0.0")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect and warm up before serving (blocking) or after binding the port (background)"""
+    if startup_mode == "blocking":
+        initialize()
+    else:
+        app.state.startup_task = asyncio.create_task(asyncio.to_thread(initialize))
+    yield
+
+
+app = FastAPI(title="ChromaDB API Bridge", version="1.0.0", lifespan=lifespan)
 
 # Get allowed origins from environment or use defaults
 allowed_origins = os.getenv("ALLOWED_ORIGINS", "http://localhost:3000").split(",")
@@ -32,36 +67,149 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize ChromaDB client
-chroma_db_path = "./data/chroma_db"
+# Initialize embedding backend (openai, or hashed for a local CPU embedder)
 api_key = os.getenv("OPENAI_API_KEY")
+embedding_backend_name = os.getenv("EMBEDDING_BACKEND", "openai")
+embedding_dimensions = os.getenv("EMBEDDING_DIMENSIONS")
+embedding_backend = create_embedding_backend(
+    embedding_backend_name,
+    api_key=api_key,
+    dimensions=int(embedding_dimensions) if embedding_dimensions else None
+)
+embedding_model = embedding_backend.model_name
 
-if not api_key:
-    raise ValueError("OPENAI_API_KEY environment variable not set")
+# ChromaDB client and collection are opened by initialize() at startup
+chroma_db_path = os.getenv("CHROMA_DB_PATH", "./data/chroma_db")
+collection_name = os.getenv("CHROMA_COLLECTION", default_collection_name(embedding_backend_name))
+chroma_client = None
+collection = None
 
-chroma_client = chromadb.PersistentClient(path=chroma_db_path)
-embedding_function = embedding_functions.OpenAIEmbeddingFunction(
-    api_key=api_key,
-    model_name="text-embedding-3-small"
+# chroma: serve from the PersistentClient (single process)
+# snapshot: serve read-only from a memory-mapped export shared by every worker
+serving_mode = os.getenv("SERVING_MODE", "chroma")
+snapshot_path = os.getenv("SNAPSHOT_PATH", "./data/snapshot")
+web_concurrency = int(os.getenv("WEB_CONCURRENCY", "1"))
+
+# Blue/green swaps: poll for a newly published snapshot (snapshot mode) or a
+# new collection named in the collection manifest (chroma mode) and promote
+# it once it is loaded and warm; 0 disables the watcher
+hot_swap_check_seconds = float(os.getenv("HOT_SWAP_CHECK_SECONDS", "30"))
+collection_manifest_path = os.getenv("COLLECTION_MANIFEST", "./data/collection_manifest.json")
+
+# background: bind the port at once and warm up behind /ready
+# blocking: finish warming up before the server starts accepting requests
+startup_mode = os.getenv("STARTUP_MODE", "background")
+warmup_queries = [
+    query.strip()
+    for query in os.getenv("WARMUP_QUERIES", "things to do in Singapore").split("|")
+    if query.strip()
+]
+warmup_rounds = int(os.getenv("WARMUP_ROUNDS", "3"))
+
+
+# Metrics
+metrics = Metrics()
+
+
+@app.middleware("http")
+async def track_requests(request: Request, call_next):
+    """Count requests and time them by route template"""
+    metrics.in_flight += 1
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        metrics.in_flight -= 1
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        metrics.record_request(path, status, time.perf_counter() - start)
+
+
+# Query embedding cache
+embedding_cache = EmbeddingCache(
+    max_size=int(os.getenv("EMBEDDING_CACHE_SIZE", "1024")),
+    ttl_seconds=float(os.getenv("EMBEDDING_CACHE_TTL_SECONDS", "3600"))
 )
 
-# Get collection
-try:
-    collection = chroma_client.get_collection(
-        name="telegram_activities",
-        embedding_function=embedding_function
-    )
-    print(f"✅ Connected to ChromaDB collection: telegram_activities")
-    print(f"📊 Collection size: {collection.count()} activities")
-except Exception as e:
-    print(f"❌ Error connecting to ChromaDB: {e}")
-    raise
+
+# Persistent embedding store, shared by restarts and workers (empty path disables)
+embedding_store_path = os.getenv("EMBEDDING_STORE_PATH", "./data/embedding_store.db")
+embedding_store = EmbeddingStore(
+    embedding_store_path,
+    max_bytes=int(os.getenv("EMBEDDING_STORE_MAX_BYTES", str(256 * 1024 * 1024)))
+) if embedding_store_path else None
+
+
+def embed_texts(texts: List[str]) -> dict:
+    """Vectors for distinct texts from the persistent store, embedding and storing the rest"""
+    found = embedding_store.get_many(embedding_model, embedding_backend.dimensions, texts) if embedding_store else {}
+    missing = [text for text in texts if text not in found]
+    if missing:
+        with metrics.stage("embedding"):
+            fresh = dict(zip(missing, embedding_backend.embed(missing)))
+        if embedding_store:
+            embedding_store.put_many(embedding_model, embedding_backend.dimensions, fresh)
+        found.update(fresh)
+    return found
+
+
+def normalize_query(text: str) -> str:
+    """Collapse whitespace and case so trivially different queries share a cache entry"""
+    return " ".join(text.split()).lower()
+
+
+def embed_queries(texts: List[str]) -> list:
+    """
+    Embed query texts, serving repeats from the embedding cache
+
+    Cache misses are looked up in the persistent embedding store, and the
+    rest are sent to the embedding function in a single call.
+    """
+    normalized = [normalize_query(text) for text in texts]
+    embeddings = [embedding_cache.get((embedding_model, text)) for text in normalized]
+
+    missing = list(dict.fromkeys(
+        text for text, embedding in zip(normalized, embeddings) if embedding is None
+    ))
+    if missing:
+        fresh = embed_texts(missing)
+        for text, embedding in fresh.items():
+            embedding_cache.put((embedding_model, text), embedding)
+        embeddings = [
+            embedding if embedding is not None else fresh[text]
+            for text, embedding in zip(normalized, embeddings)
+        ]
+
+    return embeddings
 
 
 # Request/Response models
+class SearchFilters(BaseModel):
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    include_unknown_price: bool = True
+    offer_type: Optional[List[str]] = None
+    tags_any: Optional[List[str]] = None
+    tags_all: Optional[List[str]] = None
+    source_type: Optional[List[str]] = None
+    valid_on: Optional[date] = None
+
+
+# Largest n_results any search accepts; it also bounds MMR and collapse candidate pools
+max_n_results = int(os.getenv("MAX_N_RESULTS", "100"))
+
+
 class SearchRequest(BaseModel):
     query: str
-    n_results: int = 20
+    n_results: int = Field(default=20, ge=1, le=max_n_results)
+    filters: Optional[SearchFilters] = None
+    mode: Literal["vector", "hybrid", "keyword"] = "vector"
+    diversity: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    # Keep only the best hit per venue (google_places_id, else venue + title)
+    collapse: bool = False
 
 
 class Activity(BaseModel):
@@ -79,6 +227,8 @@ class Activity(BaseModel):
     source_link: Optional[str] = None
     latitude: Optional[float] = None
     longitude: Optional[float] = None
+    # Collection id, for /activities/{id}/similar
+    id: Optional[str] = None
 
 
 class SearchResponse(BaseModel):
@@ -87,116 +237,1826 @@ class SearchResponse(BaseModel):
     count: int
 
 
+# Most searches one batch may carry, and most results they may ask for together
+max_batch_searches = int(os.getenv("MAX_BATCH_SEARCHES", "20"))
+max_batch_results = int(os.getenv("MAX_BATCH_RESULTS", "400"))
+
+
+class BatchSearchRequest(BaseModel):
+    searches: List[SearchRequest] = Field(min_length=1, max_length=max_batch_searches)
+    dedupe: bool = False
+
+    @model_validator(mode="after")
+    def bound_total_results(self):
+        # With dedupe one collection query fetches the sum of every search's n_results
+        total = sum(search.n_results for search in self.searches)
+        if total > max_batch_results:
+            raise ValueError(f"searches ask for {total} results in total, at most {max_batch_results} allowed")
+        return self
+
+
+class BatchSearchResponse(BaseModel):
+    results: List[SearchResponse]
+
+
+# Largest nearby search area: the radius, or half of either side of a bbox
+nearby_max_radius_km = float(os.getenv("NEARBY_MAX_RADIUS_KM", "50"))
+
+
+class BoundingBox(BaseModel):
+    min_latitude: float = Field(ge=-90, le=90)
+    min_longitude: float = Field(ge=-180, le=180)
+    max_latitude: float = Field(ge=-90, le=90)
+    max_longitude: float = Field(ge=-180, le=180)
+
+
+class NearbySearchRequest(BaseModel):
+    query: Optional[str] = None
+    latitude: Optional[float] = Field(default=None, ge=-90, le=90)
+    longitude: Optional[float] = Field(default=None, ge=-180, le=180)
+    radius_km: float = Field(default=2.0, gt=0, le=nearby_max_radius_km)
+    bbox: Optional[BoundingBox] = None
+    n_results: int = Field(default=20, ge=1, le=max_n_results)
+    distance_weight: float = 0.5
+    filters: Optional[SearchFilters] = None
+
+
+class NearbyActivity(Activity):
+    distance_km: float
+
+
+class NearbySearchResponse(BaseModel):
+    activities: List[NearbyActivity]
+    query: Optional[str]
+    count: int
+
+
+class SimilarSearchRequest(BaseModel):
+    n_results: int = Field(default=20, ge=1, le=max_n_results)
+    filters: Optional[SearchFilters] = None
+    collapse: bool = False
+
+
+class PreferenceSearchRequest(BaseModel):
+    # Same fields as buildSemanticKeywords() in keywords.ts
+    query: str = ""
+    activities: Optional[List[str]] = None
+    budget: Optional[int] = None
+    numPax: Optional[str] = None
+    mbti: Optional[str] = None
+    spicy: bool = False
+    n_results: int = Field(default=20, ge=1, le=max_n_results)
+    filters: Optional[SearchFilters] = None
+    diversity: Optional[float] = Field(default=None, ge=0.0, le=1.0)
+    collapse: bool = False
+    # Per-facet weights overriding PREFERENCE_FACET_WEIGHTS
+    weights: Optional[Dict[str, Annotated[float, Field(gt=0, allow_inf_nan=False)]]] = None
+
+
+def parse_activity(metadata: dict) -> Optional[Activity]:
+    """Build an Activity from a ChromaDB metadata record, or None if it has no payload"""
+    if not metadata or 'full_data' not in metadata:
+        return None
+
+    # Parse full_data JSON string
+    return activity_from_data(json.loads(metadata['full_data']))
+
+
+def activity_from_data(full_data: dict, activity_id: Optional[str] = None) -> Activity:
+    """Build an Activity from a parsed full_data record"""
+    # Parse source_link (it's stored as a JSON array string)
+    source_link_raw = full_data.get('source_link')
+    source_link = None
+    if source_link_raw:
+        try:
+            # Try to parse as JSON array and get first link
+            links = json.loads(source_link_raw)
+            if isinstance(links, list) and len(links) > 0:
+                source_link = links[0]
+            else:
+                source_link = source_link_raw
+        except:
+            # If not JSON, use as is
+            source_link = source_link_raw
+
+    # Create Activity object
+    return Activity(
+        title=full_data.get('title', 'Untitled'),
+        description=full_data.get('description', ''),
+        location=full_data.get('location', 'Singapore'),
+        venue_name=full_data.get('venue_name', ''),
+        price=full_data.get('price'),
+        tags=full_data.get('tags', []),
+        duration_hours=full_data.get('duration_hours'),
+        offer_type=full_data.get('offer_type', 'activity'),
+        validity_end=full_data.get('validity_end'),
+        source_channel=full_data.get('source_channel', ''),
+        source_type=full_data.get('source_type', ''),
+        source_link=source_link,
+        latitude=full_data.get('latitude'),
+        longitude=full_data.get('longitude'),
+        id=activity_id
+    )
+
+
+# Response encoding
+# Activities are encoded to JSON once when the store loads; responses are
+# assembled by concatenating those fragments instead of re-validating and
+# re-encoding pydantic models per request.
+def encode_activity(activity: Activity) -> bytes:
+    return orjson.dumps(activity.model_dump())
+
+
+def with_distance(fragment: bytes, distance_km: float) -> bytes:
+    """Append distance_km to a pre-encoded activity object"""
+    return fragment[:-1] + b',"distance_km":' + orjson.dumps(distance_km) + b"}"
+
+
+def encode_search_response(fragments: List[bytes], query: Optional[str]) -> bytes:
+    """SearchResponse / NearbySearchResponse JSON body from activity fragments"""
+    return b"".join([
+        b'{"activities":[', b",".join(fragments),
+        b'],"query":', orjson.dumps(query),
+        b',"count":', str(len(fragments)).encode("ascii"), b"}"
+    ])
+
+
+def encode_batch_response(bodies: List[bytes]) -> bytes:
+    """BatchSearchResponse JSON body from per-search response bodies"""
+    return b'{"results":[' + b",".join(bodies) + b"]}"
+
+
+# Metadata filters
+def combine_where(operator: str, clauses: List[dict]) -> Optional[dict]:
+    """Join where clauses, since Chroma rejects $and/$or with fewer than two entries"""
+    if not clauses:
+        return None
+    if len(clauses) == 1:
+        return clauses[0]
+    return {operator: clauses}
+
+
+def build_where(filters: Optional[SearchFilters]) -> Optional[dict]:
+    """Translate SearchFilters into a ChromaDB where clause"""
+    if filters is None:
+        return None
+
+    clauses = []
+
+    price_clauses = []
+    if filters.min_price is not None:
+        price_clauses.append({"price": {"$gte": filters.min_price}})
+    if filters.max_price is not None:
+        price_clauses.append({"price": {"$lte": filters.max_price}})
+    if price_clauses:
+        price_where = combine_where("$and", price_clauses)
+        if filters.include_unknown_price:
+            price_where = {"$or": [price_where, {"has_price": False}]}
+        clauses.append(price_where)
+
+    if filters.offer_type:
+        clauses.append({"offer_type": {"$in": [value.lower() for value in filters.offer_type]}})
+
+    if filters.source_type:
+        clauses.append({"source_type": {"$in": [value.lower() for value in filters.source_type]}})
+
+    if filters.tags_any:
+        clauses.append(combine_where("$or", [{tag_key(tag): True} for tag in filters.tags_any]))
+
+    if filters.tags_all:
+        clauses.extend({tag_key(tag): True} for tag in filters.tags_all)
+
+    if filters.valid_on is not None:
+        clauses.append({"validity_end_ord": {"$gte": date_ordinal(filters.valid_on)}})
+
+    return combine_where("$and", clauses)
+
+
+# Expiry index
+# Offers are served through their validity_end date in EXPIRY_TIMEZONE and
+# dropped from the serving set the day after; chromadb_admin.py compact
+# deletes them from the collection itself.
+expiry_timezone = configured_timezone()
+expiry_sweep_seconds = float(os.getenv("EXPIRY_SWEEP_SECONDS", "300"))
+
+
+def expiry_cutoff() -> int:
+    """Today's date ordinal; offers whose validity_end is earlier have expired"""
+    return today_ordinal(expiry_timezone)
+
+
+# Duplicate collapse
+# Reposts across channels and the Telegram and Instagram copies of one offer
+# share a google_places_id; records without one fall back to their venue
+# and title, normalized the way the lexical index tokenizes them.
+collapse_candidate_multiplier = int(os.getenv("COLLAPSE_CANDIDATE_MULTIPLIER", "3"))
+collapse_max_candidates = int(os.getenv("COLLAPSE_MAX_CANDIDATES", "500"))
+
+
+def collapse_key(activity_id: str, full_data: dict) -> str:
+    place_id = full_data.get('google_places_id')
+    if place_id:
+        return f"place:{place_id}"
+    venue = " ".join(tokenize(full_data.get('venue_name') or ''))
+    title = " ".join(tokenize(full_data.get('title') or ''))
+    if not venue and not title:
+        return f"id:{activity_id}"
+    return f"venue:{venue}|{title}"
+
+
+# In-memory activity store
+class ActivityStore:
+    """
+    Id-keyed store of parsed activities hydrated from the collection
+
+    Every record is parsed and validated once at load time so queries only
+    need ids from ChromaDB. The store reloads itself when the collection
+    count changes or a record's full_data is rewritten in place (each check
+    compares one page of records, rotating through the collection), and
+    hydrates unknown ids on demand. A spatial grid over
+    activity coordinates, a BM25 index over activity text and a content
+    fingerprint of the collection are rebuilt on every load. Flat filter
+    metadata that is missing or stale in the collection is derived from
+    full_data in memory for the numpy engine and never written back; the
+    chroma engine filters on what is stored, so run chromadb_admin.py
+    backfill-filters for it.
+
+    The vector index is chosen on every load as well: vector_engine=numpy
+    builds an in-memory NumpyVectorIndex (optionally quantized), chroma
+    queries the collection's HNSW index, and auto picks numpy while the
+    collection has at most engine_auto_max records.
+
+    A format 2 snapshot is served from its memory-mapped arrays without
+    parsing full_data (see _load_snapshot).
+
+    With drop_expired set, offers past their validity_end are left out of
+    the serving set at load, and sweep_expired() drops the ones that have
+    expired since, using an ExpiryIndex instead of scanning every record.
+    """
+
+    def __init__(self, collection, refresh_seconds: float, geo_cell_degrees: float,
+                 page_size: int = 500, vector_engine: str = "auto",
+                 quantization: str = "none", engine_auto_max: int = 20000, rerank_multiplier: int = 4,
+                 drop_expired: bool = True):
+        self.collection = collection
+        self.vector_index = collection
+        self.vector_engine = vector_engine
+        self.quantization = quantization
+        self.engine_auto_max = engine_auto_max
+        self.rerank_multiplier = rerank_multiplier
+        self.geo_cell_degrees = geo_cell_degrees
+        self.geo_index = GeoGridIndex(geo_cell_degrees)
+        self.lexical_index = BM25Index()
+        self.refresh_seconds = refresh_seconds
+        self.filters_current = False
+        self.page_size = page_size
+        self.drop_expired = drop_expired
+        self.expiry_index = ExpiryIndex()
+        self.expired_cutoff = None
+        self.version = 0
+        self.fingerprint = ""
+        self._content_fingerprint = ""
+        self._expired = frozenset()
+        self._collapse_keys = {}
+        self._activities = {}
+        self._fragments = {}
+        self._collection_count = 0
+        self._payload_hashes = {}
+        self._verify_offset = 0
+        self._last_checked = 0.0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def __len__(self):
+        fragments = self._fragments
+        # Snapshot fragments still hold expired offers; private ones do not
+        return len(fragments) if isinstance(fragments, dict) else len(fragments) - len(self._expired)
+
+    def replica(self, collection) -> "ActivityStore":
+        """An empty store with the same settings over another collection"""
+        return ActivityStore(
+            collection,
+            refresh_seconds=self.refresh_seconds,
+            geo_cell_degrees=self.geo_cell_degrees,
+            page_size=self.page_size,
+            vector_engine=self.vector_engine,
+            quantization=self.quantization,
+            engine_auto_max=self.engine_auto_max,
+            rerank_multiplier=self.rerank_multiplier,
+            drop_expired=self.drop_expired
+        )
+
+    def _hydrate(self, ids: List[str], metadatas: List[dict], stale: Optional[dict] = None):
+        activities = {}
+        records = {}
+        for activity_id, metadata in zip(ids, metadatas):
+            try:
+                if not metadata or 'full_data' not in metadata:
+                    continue
+                full_data = json.loads(metadata['full_data'])
+                activities[activity_id] = activity_from_data(full_data, activity_id)
+                records[activity_id] = full_data
+
+                if stale is not None:
+                    update = stale_filter_fields(metadata, full_data)
+                    if update:
+                        stale[activity_id] = update
+            except Exception as parse_error:
+                print(f"⚠️ Error parsing activity {activity_id}: {parse_error}")
+        return activities, records
+
+    def use_numpy_engine(self) -> bool:
+        if self.vector_engine == "numpy":
+            return True
+        if self.vector_engine == "auto":
+            # A snapshot is already searched exactly from shared pages
+            if isinstance(self.collection, SnapshotCollection):
+                return False
+            return self.collection.count() <= self.engine_auto_max
+        return False
+
+    def _build_vector_index(self, ids: List[str], embeddings: list, metadatas: List[dict], stale: Optional[dict]):
+        filter_fields = []
+        for activity_id, metadata in zip(ids, metadatas):
+            fields = {key: value for key, value in (metadata or {}).items() if key != 'full_data'}
+            for key, value in ((stale or {}).get(activity_id) or {}).items():
+                if value is None:
+                    fields.pop(key, None)
+                else:
+                    fields[key] = value
+            filter_fields.append(fields)
+
+        space = (self.collection.configuration.get("hnsw") or {}).get("space", "l2")
+        return NumpyVectorIndex(
+            self.collection,
+            ids,
+            np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1),
+            filter_fields,
+            space=space,
+            quantization=self.quantization,
+            rerank_multiplier=self.rerank_multiplier
+        )
+
+    def _build_geo_index(self, activities: dict) -> GeoGridIndex:
+        geo_index = GeoGridIndex(self.geo_cell_degrees)
+        for activity_id, activity in activities.items():
+            if activity.latitude is not None and activity.longitude is not None:
+                geo_index.add(activity_id, activity.latitude, activity.longitude)
+        return geo_index
+
+    @staticmethod
+    def _serving_fingerprint(content_fingerprint: str, expired: int) -> str:
+        # Expiry only ever removes a prefix of the validity_end order, so the
+        # number dropped identifies the serving set on every worker
+        if not expired:
+            return content_fingerprint
+        return hashlib.sha256(f"{content_fingerprint}|expired:{expired}".encode("utf-8")).hexdigest()
+
+    def live_where(self, where: Optional[dict]) -> Optional[dict]:
+        """where, also excluding expired offers when the vector index cannot leave them out itself"""
+        if not self._expired or hasattr(self.vector_index, "remove") or not self.filters_current:
+            return where
+        # Chroma's HNSW index cannot drop rows, but it filters on the stored expiry field
+        bound = {"validity_end_ord": {"$gte": self.expired_cutoff}}
+        return bound if where is None else {"$and": [where, bound]}
+
+    def vector_engine_stats(self) -> dict:
+        vector_index = self.vector_index
+        if isinstance(vector_index, NumpyVectorIndex):
+            return vector_index.stats()
+        return {"engine": "snapshot" if isinstance(vector_index, SnapshotCollection) else "chroma"}
+
+    def load(self):
+        """Parse every record in the collection and swap it in as the serving set"""
+        if isinstance(self.collection, SnapshotCollection) and self.collection.lexical is not None:
+            return self._load_snapshot()
+
+        start = time.perf_counter()
+        activities = {}
+        records = {}
+        payloads = {}
+        stale = {}
+        offset = 0
+
+        use_numpy = self.use_numpy_engine()
+        vector_ids, vector_embeddings, vector_metadatas = [], [], []
+
+        while True:
+            page = self.collection.get(
+                include=["metadatas", "embeddings"] if use_numpy else ["metadatas"],
+                limit=self.page_size,
+                offset=offset
+            )
+            if not page['ids']:
+                break
+            if use_numpy:
+                vector_ids.extend(page['ids'])
+                vector_embeddings.extend(page['embeddings'])
+                vector_metadatas.extend(page['metadatas'])
+            page_activities, page_records = self._hydrate(page['ids'], page['metadatas'], stale)
+            activities.update(page_activities)
+            records.update(page_records)
+            for activity_id, metadata in zip(page['ids'], page['metadatas']):
+                payloads[activity_id] = (metadata or {}).get('full_data', '')
+            offset += len(page['ids'])
+
+        if stale and not use_numpy:
+            print(f"⚠️ {len(stale)} activities have missing or stale filter metadata; "
+                  f"run 'python chromadb_admin.py backfill-filters' so the chroma engine can filter them")
+
+        expiry_index = ExpiryIndex().build({
+            activity_id: date_ordinal(full_data.get('validity_end')) for activity_id, full_data in records.items()
+        })
+        cutoff = expiry_cutoff()
+        expired = frozenset(expiry_index.pop_expired(cutoff) if self.drop_expired else [])
+        if expired:
+            activities = {activity_id: activity for activity_id, activity in activities.items() if activity_id not in expired}
+            records = {activity_id: full_data for activity_id, full_data in records.items() if activity_id not in expired}
+
+        if use_numpy:
+            vector_index = self._build_vector_index(vector_ids, vector_embeddings, vector_metadatas, stale)
+        else:
+            vector_index = self.collection
+        if expired and hasattr(vector_index, "remove"):
+            vector_index.remove(list(expired))
+
+        geo_index = self._build_geo_index(activities)
+
+        if isinstance(self.collection, SnapshotCollection):
+            # Serve the snapshot's pre-encoded pages instead of a private copy
+            fragments = self.collection.fragments
+        else:
+            fragments = {activity_id: encode_activity(activity) for activity_id, activity in activities.items()}
+
+        lexical_index = BM25Index().build({
+            activity_id: lexical_text(full_data) for activity_id, full_data in records.items()
+        })
+        collapse_keys = {activity_id: collapse_key(activity_id, full_data) for activity_id, full_data in records.items()}
+
+        # Stable across processes and restarts, changes whenever any record does
+        digest = hashlib.sha256()
+        for activity_id in sorted(payloads):
+            digest.update(activity_id.encode("utf-8"))
+            digest.update(b"\0")
+            digest.update(payloads[activity_id].encode("utf-8"))
+            digest.update(b"\0")
+
+        with self._lock:
+            self._activities = activities
+            self._fragments = fragments
+            self.filters_current = not stale
+            self._collapse_keys = collapse_keys
+            self.geo_index = geo_index
+            self.lexical_index = lexical_index
+            self.vector_index = vector_index
+            self.expiry_index = expiry_index
+            self.expired_cutoff = cutoff
+            self._expired = expired
+            self._collection_count = offset
+            self._payload_hashes = {activity_id: hash(payload) for activity_id, payload in payloads.items()}
+            self._verify_offset = 0
+            self._last_checked = time.monotonic()
+            self.version += 1
+            self._content_fingerprint = digest.hexdigest()
+            self.fingerprint = self._serving_fingerprint(self._content_fingerprint, len(expired))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"📦 Loaded {len(activities)} activities into memory in {elapsed_ms:.0f}ms")
+        if expired:
+            print(f"⌛ Left out {len(expired)} expired offers")
+        print(f"🧮 Vector engine: {self.vector_engine_stats()}")
+
+    def _load_snapshot(self):
+        """
+        Serve a format 2 snapshot straight from its shared arrays
+
+        Nothing is parsed from full_data: expiry comes from the flat
+        metadata, and fragments, BM25 postings, collapse groups and
+        coordinates stay memory-mapped, so a worker's own memory holds ids,
+        filter fields, the token vocabulary and the geo grid.
+        """
+        start = time.perf_counter()
+        snapshot = self.collection
+        ids = snapshot.ids
+
+        expiry_index = ExpiryIndex().build({
+            activity_id: fields.get("validity_end_ord") if fields.get("validity_end_ord") != NO_EXPIRY_ORDINAL else None
+            for activity_id, fields in zip(ids, snapshot.filter_fields)
+        })
+        cutoff = expiry_cutoff()
+        expired = frozenset(expiry_index.pop_expired(cutoff) if self.drop_expired else [])
+        if expired:
+            snapshot.remove(list(expired))
+
+        geo_index = GeoGridIndex(self.geo_cell_degrees)
+        coordinates = snapshot.coordinates
+        for row in np.flatnonzero(~np.isnan(coordinates).any(axis=1)):
+            if ids[row] not in expired:
+                geo_index.add(ids[row], float(coordinates[row, 0]), float(coordinates[row, 1]))
+
+        lexical_index = BM25Index().from_arrays(ids, snapshot.rows, *snapshot.lexical)
+        if expired:
+            lexical_index.remove(list(expired))
+
+        with self._lock:
+            self._activities = {}
+            self._fragments = snapshot.fragments
+            self.filters_current = True
+            self._collapse_keys = snapshot.collapse_groups
+            self.geo_index = geo_index
+            self.lexical_index = lexical_index
+            self.vector_index = snapshot
+            self.expiry_index = expiry_index
+            self.expired_cutoff = cutoff
+            self._expired = expired
+            self._collection_count = len(ids)
+            self._payload_hashes = {}
+            self._verify_offset = 0
+            self._last_checked = time.monotonic()
+            self.version += 1
+            # Every export gets a new snapshot_id, and every worker reads the same one
+            self._content_fingerprint = hashlib.sha256(f"snapshot:{snapshot.manifest['snapshot_id']}".encode("utf-8")).hexdigest()
+            self.fingerprint = self._serving_fingerprint(self._content_fingerprint, len(expired))
+
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"📦 Mapped {len(ids) - len(expired)} activities from the snapshot in {elapsed_ms:.0f}ms")
+        if expired:
+            print(f"⌛ Left out {len(expired)} expired offers")
+        print(f"🧮 Vector engine: {self.vector_engine_stats()}")
+
+    def sweep_expired(self) -> int:
+        """Drop offers that have expired since the last load or sweep from the serving set"""
+        if not self.drop_expired:
+            return 0
+
+        cutoff = expiry_cutoff()
+        with self._lock:
+            expired = self.expiry_index.pop_expired(cutoff)
+            if not expired:
+                return 0
+
+            gone = set(expired)
+            # Rebuilt rather than mutated so searches in flight see one version
+            self._activities = {
+                activity_id: activity for activity_id, activity in self._activities.items() if activity_id not in gone
+            }
+            if isinstance(self._fragments, dict):
+                self._fragments = {
+                    activity_id: fragment for activity_id, fragment in self._fragments.items() if activity_id not in gone
+                }
+            self.geo_index = self.geo_index.without(gone)
+            self.lexical_index.remove(expired)
+            if hasattr(self.vector_index, "remove"):
+                self.vector_index.remove(expired)
+            self._expired = self._expired | gone
+            self.expired_cutoff = cutoff
+            self.fingerprint = self._serving_fingerprint(self._content_fingerprint, len(self._expired))
+
+        print(f"⌛ Dropped {len(expired)} expired offers from the serving set")
+        return len(expired)
+
+    def expiry_stats(self) -> dict:
+        next_expiry = self.expiry_index.next_expiry()
+        return {
+            "enabled": self.drop_expired,
+            "expired": len(self._expired),
+            "expiring": len(self.expiry_index),
+            "next_validity_end": f"{next_expiry // 10000:04d}-{next_expiry // 100 % 100:02d}-{next_expiry % 100:02d}" if next_expiry else None
+        }
+
+    def refresh_due(self) -> bool:
+        return time.monotonic() - self._last_checked >= self.refresh_seconds
+
+    def _page_changed(self) -> bool:
+        """Compare the next page of records with what was loaded, wrapping around at the end"""
+        offset = self._verify_offset if self._verify_offset < self._collection_count else 0
+        page = self.collection.get(include=["metadatas"], limit=self.page_size, offset=offset)
+        self._verify_offset = offset + len(page['ids'])
+        payload_hashes = self._payload_hashes
+        return any(
+            payload_hashes.get(activity_id) != hash((metadata or {}).get('full_data', ''))
+            for activity_id, metadata in zip(page['ids'], page['metadatas'])
+        )
+
+    def refresh_if_changed(self):
+        """Reload when the collection's count or content has changed, checking at most every refresh_seconds"""
+        if not self.refresh_due():
+            return
+        # Searches arriving while another one checks or reloads serve the current set
+        if not self._refresh_lock.acquire(blocking=False):
+            return
+        try:
+            if not self.refresh_due():
+                return
+            self._last_checked = time.monotonic()
+            count = self.collection.count()
+            if count != self._collection_count:
+                print(f"🔄 Collection changed ({self._collection_count} -> {count}), reloading activities")
+                self.load()
+            elif not isinstance(self.collection, SnapshotCollection) and self._page_changed():
+                # Snapshots are immutable; new ones arrive through the store swapper
+                print("🔄 Collection records were rewritten in place, reloading activities")
+                self.load()
+        finally:
+            self._refresh_lock.release()
+
+    def _ensure_loaded(self, ids: List[str]):
+        """Hydrate any ids that are not in the store yet"""
+        if not isinstance(self._fragments, dict):
+            # A snapshot is read-only and fully mapped; an id it lacks does not exist
+            return
+        expired = self._expired
+        missing = [
+            activity_id for activity_id in ids
+            if activity_id not in self._fragments and activity_id not in expired
+        ]
+        if not missing:
+            return
+
+        page = self.collection.get(ids=missing, include=["metadatas"])
+        hydrated, _ = self._hydrate(page['ids'], page['metadatas'])
+        with self._lock:
+            self._activities.update(hydrated)
+            self._fragments.update(
+                (activity_id, encode_activity(activity)) for activity_id, activity in hydrated.items()
+            )
+
+    def collapse(self, ids: List[str], n_results: int) -> List[str]:
+        """The first (best) id of each collapse group, up to n_results"""
+        keys = self._collapse_keys
+        seen = set()
+        kept = []
+        for activity_id in ids:
+            # Ids hydrated on demand have no key and stand alone
+            key = keys.get(activity_id, activity_id)
+            if key in seen:
+                continue
+            seen.add(key)
+            kept.append(activity_id)
+            if len(kept) == n_results:
+                break
+        return kept
+
+    def embedding(self, activity_id: str) -> Optional[np.ndarray]:
+        """Stored embedding of a live activity, or None if it is unknown or expired"""
+        if activity_id in self._expired:
+            return None
+        vector_index = self.vector_index
+        if isinstance(vector_index, NumpyVectorIndex):
+            return vector_index.embedding(activity_id)
+        stored = vector_index.get(ids=[activity_id], include=["embeddings"])
+        if not stored['ids']:
+            return None
+        return np.asarray(stored['embeddings'][0], dtype=np.float32)
+
+    def get_many(self, ids: List[str]) -> List[Activity]:
+        """Look up activities by id in hit order, hydrating any ids not loaded yet"""
+        self._ensure_loaded(ids)
+        if not isinstance(self._fragments, dict):
+            return [Activity.model_validate_json(fragment) for fragment in self.get_fragments(ids)]
+        activities = self._activities
+        return [activities[activity_id] for activity_id in ids if activity_id in activities]
+
+    def get_fragments(self, ids: List[str]) -> List[bytes]:
+        """Pre-encoded activity JSON by id in hit order, hydrating any ids not loaded yet"""
+        self._ensure_loaded(ids)
+        # Snapshot fragments are read-only and still hold expired offers
+        fragments, expired = self._fragments, self._expired
+        return [fragments[activity_id] for activity_id in ids if activity_id in fragments and activity_id not in expired]
+
+    def fragment_map(self, ids: List[str]) -> dict:
+        """Pre-encoded activity JSON keyed by id for the ids that exist"""
+        self._ensure_loaded(ids)
+        fragments, expired = self._fragments, self._expired
+        return {
+            activity_id: fragments[activity_id]
+            for activity_id in ids if activity_id in fragments and activity_id not in expired
+        }
+
+
+activity_store = ActivityStore(
+    None,
+    refresh_seconds=float(os.getenv("STORE_REFRESH_SECONDS", "30")),
+    geo_cell_degrees=float(os.getenv("GEO_CELL_DEGREES", "0.01")),
+    vector_engine=os.getenv("VECTOR_ENGINE", "auto"),
+    quantization=os.getenv("VECTOR_QUANTIZATION", "none"),
+    engine_auto_max=int(os.getenv("VECTOR_ENGINE_AUTO_MAX", "20000")),
+    rerank_multiplier=int(os.getenv("VECTOR_RERANK_MULTIPLIER", "4")),
+    drop_expired=os.getenv("DROP_EXPIRED_OFFERS", "true").lower() == "true"
+)
+
+
+# Response cache
+response_cache = ResponseCache(
+    max_bytes=int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    directory=os.getenv("RESPONSE_CACHE_DIR") or None,
+    disk_max_bytes=int(os.getenv("RESPONSE_CACHE_DISK_MAX_BYTES", str(256 * 1024 * 1024))),
+    embedding_model=embedding_model
+)
+
+
+async def refresh_store_if_due():
+    """Run the store's change check on the search pool before serving from cache"""
+    if activity_store.refresh_due():
+        await search_executor.run(activity_store.refresh_if_changed)
+        response_cache.prune(activity_store.fingerprint)
+
+
+def json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+# Semantic query cache
+semantic_cache = SemanticCache(
+    max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "512")),
+    max_distance=float(os.getenv("SEMANTIC_CACHE_MAX_DISTANCE", "0")),
+    rerank=os.getenv("SEMANTIC_CACHE_RERANK", "true").lower() == "true",
+    candidate_multiplier=int(os.getenv("SEMANTIC_CACHE_CANDIDATE_MULTIPLIER", "2"))
+)
+
+
+# Preference facets
+# Keyword lists mirror buildSemanticKeywords() in keywords.ts. Each list is
+# embedded once and combined with the free-text query by weighted sum, so
+# only the user's own words cost an embedding call per request.
+BUDGET_KEYWORDS = {
+    0: ['cheap', 'budget', 'free', 'affordable', 'broke'],
+    1: ['budget-friendly', 'affordable', 'reasonable'],
+    2: ['moderate', 'mid-range'],
+    3: ['comfortable', 'nice', 'quality'],
+    4: ['premium', 'luxury', 'upscale', 'high-end']
+}
+PAX_KEYWORDS = {
+    'solo': ['solo', 'alone', 'individual'],
+    'date': ['romantic', 'couple', 'date', 'intimate'],
+    'double-date': ['double-date', 'couples', 'group'],
+    '3-5': ['small group', 'friends'],
+    '6-7': ['group', 'party'],
+    '8+': ['large group', 'party', 'gathering']
+}
+MBTI_KEYWORDS = {
+    'ENFP': ['creative', 'spontaneous', 'social', 'adventurous', 'enthusiastic'],
+    'INFP': ['authentic', 'artistic', 'meaningful', 'quiet', 'creative'],
+    'ENTP': ['innovative', 'debate', 'adventure', 'intellectual'],
+    'INTP': ['analytical', 'logical', 'independent', 'thoughtful'],
+    'ENFJ': ['social', 'organized', 'warm', 'inspiring'],
+    'INFJ': ['meaningful', 'deep', 'insightful', 'private'],
+    'ENTJ': ['leadership', 'strategic', 'efficient', 'bold'],
+    'INTJ': ['strategic', 'independent', 'intellectual', 'planning'],
+    'ESFP': ['entertaining', 'social', 'fun', 'lively', 'spontaneous'],
+    'ISFP': ['artistic', 'gentle', 'flexible', 'aesthetic'],
+    'ESTP': ['action', 'bold', 'energetic', 'hands-on'],
+    'ISTP': ['practical', 'independent', 'observant', 'hands-on'],
+    'ESFJ': ['social', 'caring', 'organized', 'traditional'],
+    'ISFJ': ['caring', 'detailed', 'supportive', 'traditional'],
+    'ESTJ': ['organized', 'practical', 'direct', 'responsible'],
+    'ISTJ': ['organized', 'reliable', 'practical', 'detail-oriented']
+}
+SPICY_KEYWORDS = ['nightlife', 'drinks', 'bar', 'club', 'cocktail', 'evening', 'party']
+
+PREFERENCE_FACET_WEIGHTS = {
+    "query": 1.0,
+    "activities": 0.6,
+    "budget": 0.3,
+    "numPax": 0.3,
+    "mbti": 0.3,
+    "spicy": 0.4
+}
+
+
+class PreferenceFacets:
+    """
+    Facet vectors for the fixed keyword sets, embedded once per process
+
+    The free-text query and activity names still go through the query
+    embedding cache; everything else is looked up here.
+    """
+
+    def __init__(self):
+        self._vectors = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def all_texts() -> List[str]:
+        keyword_sets = list(BUDGET_KEYWORDS.values()) + list(PAX_KEYWORDS.values()) + list(MBTI_KEYWORDS.values())
+        return [" ".join(keywords) for keywords in keyword_sets + [SPICY_KEYWORDS]]
+
+    @staticmethod
+    def facet_texts(request: PreferenceSearchRequest) -> Dict[str, str]:
+        """Keyword text per facet the request selects; unknown values are ignored like keywords.ts does"""
+        keyword_sets = {
+            "budget": BUDGET_KEYWORDS.get(request.budget),
+            "numPax": PAX_KEYWORDS.get(request.numPax),
+            "mbti": MBTI_KEYWORDS.get((request.mbti or "").upper()),
+            "spicy": SPICY_KEYWORDS if request.spicy else None
+        }
+        return {facet: " ".join(keywords) for facet, keywords in keyword_sets.items() if keywords}
+
+    @staticmethod
+    def active_weights(request: PreferenceSearchRequest) -> Dict[str, float]:
+        """Weight of each part the request actually uses: query, activities and selected facets"""
+        weights = {**PREFERENCE_FACET_WEIGHTS, **(request.weights or {})}
+        parts = []
+        if request.query.strip():
+            parts.append("query")
+        if any(activity.strip() for activity in request.activities or []):
+            parts.append("activities")
+        parts.extend(PreferenceFacets.facet_texts(request))
+        return {part: weights[part] for part in parts}
+
+    def vectors(self, texts: List[str]) -> List[np.ndarray]:
+        with self._lock:
+            missing = [text for text in dict.fromkeys(texts) if text not in self._vectors]
+        if missing:
+            embedded = embed_texts(missing)
+            with self._lock:
+                self._vectors.update(embedded)
+        return [self._vectors[text] for text in texts]
+
+    def precompute(self):
+        self.vectors(self.all_texts())
+
+    def compose(self, request: PreferenceSearchRequest) -> np.ndarray:
+        """Unit-length weighted sum of the query, activity and facet embeddings"""
+        weights = {**PREFERENCE_FACET_WEIGHTS, **(request.weights or {})}
+        parts = []
+
+        free_text = [request.query] if request.query.strip() else []
+        activities = [activity.lower() for activity in request.activities or [] if activity.strip()]
+        if free_text or activities:
+            embedded = embed_queries(free_text + activities)
+            if free_text:
+                parts.append((weights["query"], embedded[0]))
+            if activities:
+                parts.append((weights["activities"], unit_rows(np.asarray(embedded[len(free_text):], dtype=np.float32)).mean(axis=0)))
+
+        facets = self.facet_texts(request)
+        for facet, vector in zip(facets, self.vectors(list(facets.values()))):
+            parts.append((weights[facet], vector))
+
+        combined = sum(
+            weight * unit_rows(np.asarray([vector], dtype=np.float32))[0]
+            for weight, vector in parts
+        )
+        return unit_rows(np.asarray([combined], dtype=np.float32))[0]
+
+
+preference_facets = PreferenceFacets()
+
+
+# Search execution
+search_executor = SearchExecutor(
+    max_concurrency=int(os.getenv("SEARCH_MAX_CONCURRENCY", "4")),
+    max_queue=int(os.getenv("SEARCH_MAX_QUEUE", "32")),
+    retry_after_seconds=int(os.getenv("SEARCH_RETRY_AFTER_SECONDS", "1")),
+    metrics=metrics
+)
+search_flights = SingleFlight()
+
+
+def flight_key(request: BaseModel) -> str:
+    """Requests that differ only in query case or whitespace share one flight"""
+    payload = request.model_dump(mode="json")
+    if payload.get("query"):
+        payload["query"] = normalize_query(payload["query"])
+    return f"{activity_store.fingerprint}|{json.dumps(payload, sort_keys=True)}"
+
+
+hybrid_candidates = int(os.getenv("HYBRID_CANDIDATES", "50"))
+hybrid_rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+mmr_candidate_multiplier = int(os.getenv("MMR_CANDIDATE_MULTIPLIER", "4"))
+
+
+def nearest_ids(store: ActivityStore, query_embedding, n_results: int, where: Optional[dict]) -> List[str]:
+    """Nearest activity ids for an embedding from ChromaDB, or from a near-duplicate query's results"""
+    fingerprint = store.fingerprint
+
+    with metrics.stage("semantic_cache"):
+        cached = semantic_cache.get(query_embedding, n_results, where, fingerprint)
+    if cached is not None:
+        return cached
+
+    # Query ChromaDB for ids only, activities come from the store
+    fetched = semantic_cache.fetch_size(n_results) if semantic_cache.enabled else n_results
+    with metrics.stage("vector_query"):
+        results = store.vector_index.query(
+            query_embeddings=[query_embedding],
+            n_results=fetched,
+            where=store.live_where(where),
+            include=["distances", "embeddings"] if semantic_cache.enabled and semantic_cache.rerank else ["distances"]
+        )
+
+    ids = results['ids'][0]
+    semantic_cache.put(query_embedding, ids, (results.get('embeddings') or [None])[0], fetched, where, fingerprint)
+    return ids[:n_results]
+
+
+def diverse_nearest_ids(store: ActivityStore, query_embedding, n_results: int, where: Optional[dict], diversity: float) -> List[str]:
+    """Over-fetch nearest ids with their stored embeddings and MMR re-rank them in one pass"""
+    with metrics.stage("vector_query"):
+        results = store.vector_index.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results * mmr_candidate_multiplier,
+            where=store.live_where(where),
+            include=["embeddings"]
+        )
+
+    ids = results['ids'][0]
+    if not ids:
+        return []
+
+    with metrics.stage("rerank"):
+        embeddings = np.asarray(results['embeddings'][0], dtype=np.float32)
+        query_vector = unit_rows(np.asarray([query_embedding], dtype=np.float32))[0]
+        relevance = unit_rows(embeddings) @ query_vector
+        picks = mmr_select(relevance, embeddings, n_results, diversity)
+    return [ids[i] for i in picks]
+
+
+def vector_search_ids(store: ActivityStore, query: str, n_results: int, where: Optional[dict]) -> List[str]:
+    """Nearest activity ids for the query text"""
+    return nearest_ids(store, embed_queries([query])[0], n_results, where)
+
+
+def diverse_vector_search_ids(store: ActivityStore, query: str, n_results: int, where: Optional[dict], diversity: float) -> List[str]:
+    """Nearest activity ids for the query text, MMR re-ranked for diversity"""
+    return diverse_nearest_ids(store, embed_queries([query])[0], n_results, where, diversity)
+
+
+def diverse_rerank_ids(store: ActivityStore, ranked_ids: List[str], n_results: int, diversity: float) -> List[str]:
+    """MMR re-rank an already fused ranking, using rank position as relevance"""
+    if not ranked_ids:
+        return []
+
+    with metrics.stage("rerank"):
+        stored = store.collection.get(ids=ranked_ids, include=["embeddings"])
+        by_id = dict(zip(stored['ids'], stored['embeddings']))
+        ids = [activity_id for activity_id in ranked_ids if activity_id in by_id]
+        if not ids:
+            return []
+        embeddings = np.asarray([by_id[activity_id] for activity_id in ids], dtype=np.float32)
+        relevance = 1.0 - np.arange(len(ids), dtype=np.float32) / len(ids)
+        picks = mmr_select(relevance, embeddings, n_results, diversity)
+    return [ids[i] for i in picks]
+
+
+def keyword_search_ids(store: ActivityStore, query: str, n_results: int, where: Optional[dict]) -> List[str]:
+    """Best BM25 activity ids for the query, restricted to ids matching the filters"""
+    lexical_index = store.lexical_index
+    # With filters, rank every lexical match so filtering cannot starve the result
+    limit = n_results if where is None else len(lexical_index)
+    with metrics.stage("lexical_query"):
+        ids = [activity_id for activity_id, _ in lexical_index.search(query, limit)]
+        if where is not None and ids:
+            allowed = set(store.collection.get(ids=ids, where=where, include=[])['ids'])
+            ids = [activity_id for activity_id in ids if activity_id in allowed][:n_results]
+    return ids
+
+
+def collapsed_ids(store: ActivityStore, ranked_ids, n_results: int) -> List[str]:
+    """
+    Best-ranked id of each collapse group, backfilled from deeper candidates
+
+    ranked_ids(n) returns the top n ids of the same query; the candidate
+    pool grows until there are n_results groups or the query runs dry.
+    """
+    pool = n_results * collapse_candidate_multiplier
+    while True:
+        ids = ranked_ids(pool)
+        with metrics.stage("collapse"):
+            kept = store.collapse(ids, n_results)
+        if len(kept) >= n_results or len(ids) < pool or pool >= collapse_max_candidates:
+            return kept
+        pool = min(pool * 2, collapse_max_candidates)
+
+
+def search_ids(store: ActivityStore, request: SearchRequest, n_results: int, where: Optional[dict]) -> List[str]:
+    """Top n_results ids for the requested mode"""
+    if request.mode == "keyword":
+        return keyword_search_ids(store, request.query, n_results, where)
+
+    if request.mode == "hybrid":
+        pool = max(n_results, hybrid_candidates)
+        if request.diversity:
+            pool = max(pool, n_results * mmr_candidate_multiplier)
+        ids = reciprocal_rank_fusion(
+            [
+                vector_search_ids(store, request.query, pool, where),
+                keyword_search_ids(store, request.query, pool, where)
+            ],
+            k=hybrid_rrf_k
+        )
+        if request.diversity:
+            return diverse_rerank_ids(store, ids[:pool], n_results, request.diversity)
+        return ids[:n_results]
+
+    if request.diversity:
+        return diverse_vector_search_ids(store, request.query, n_results, where, request.diversity)
+    return vector_search_ids(store, request.query, n_results, where)
+
+
+def run_search(request: SearchRequest, store: Optional[ActivityStore] = None) -> List[bytes]:
+    """Look up ids for the requested mode and resolve their encoded activities (blocking)"""
+    # Hold one store for the whole search so a swap cannot change it midway
+    store = activity_store if store is None else store
+    store.refresh_if_changed()
+
+    where = build_where(request.filters)
+
+    if request.collapse:
+        ids = collapsed_ids(store, lambda n: search_ids(store, request, n, where), request.n_results)
+    else:
+        ids = search_ids(store, request, request.n_results, where)
+
+    with metrics.stage("hydration"):
+        return store.get_fragments(ids)
+
+
+def run_preference_search(request: PreferenceSearchRequest, store: Optional[ActivityStore] = None) -> List[bytes]:
+    """Search with the composed preference embedding and resolve encoded activities (blocking)"""
+    store = activity_store if store is None else store
+    store.refresh_if_changed()
+
+    query_embedding = preference_facets.compose(request)
+    where = build_where(request.filters)
+
+    def ranked_ids(n_results: int) -> List[str]:
+        if request.diversity:
+            return diverse_nearest_ids(store, query_embedding, n_results, where, request.diversity)
+        return nearest_ids(store, query_embedding, n_results, where)
+
+    if request.collapse:
+        ids = collapsed_ids(store, ranked_ids, request.n_results)
+    else:
+        ids = ranked_ids(request.n_results)
+
+    with metrics.stage("hydration"):
+        return store.get_fragments(ids)
+
+
+def run_similar_search(activity_id: str, request: SimilarSearchRequest, store: Optional[ActivityStore] = None) -> Optional[List[bytes]]:
+    """Activities nearest to a stored activity's embedding, or None if the activity is unknown (blocking)"""
+    store = activity_store if store is None else store
+    store.refresh_if_changed()
+
+    # Unknown ids stop at the embedding lookup, before any hydration
+    with metrics.stage("embedding_lookup"):
+        query_embedding = store.embedding(activity_id)
+        if query_embedding is None or not store.fragment_map([activity_id]):
+            return None
+
+    where = build_where(request.filters)
+
+    def ranked_ids(n_results: int) -> List[str]:
+        # The source always ranks first, so under collapse it claims its own
+        # venue group and its reposts are dropped with it
+        with metrics.stage("vector_query"):
+            # Bypasses the semantic cache, which holds query embeddings only
+            results = store.vector_index.query(
+                query_embeddings=[query_embedding],
+                n_results=n_results,
+                where=store.live_where(where),
+                include=["distances"]
+            )
+        ids = [hit_id for hit_id in results['ids'][0] if hit_id != activity_id]
+        return [activity_id, *ids][:n_results]
+
+    if request.collapse:
+        ids = collapsed_ids(store, ranked_ids, request.n_results + 1)
+    else:
+        ids = ranked_ids(request.n_results + 1)
+
+    with metrics.stage("hydration"):
+        return store.get_fragments(ids[1:])
+
+
+def run_batch_search(request: BatchSearchRequest, store: Optional[ActivityStore] = None) -> List[bytes]:
+    """Answer every search in the batch with one embeddings call and one collection query per filter set (blocking)"""
+    # With dedupe, later lists backfill past ids already returned earlier
+    n_results = max(search.n_results for search in request.searches)
+    if request.dedupe:
+        n_results = sum(search.n_results for search in request.searches)
+
+    store = activity_store if store is None else store
+    store.refresh_if_changed()
+
+    embeddings = embed_queries([search.query for search in request.searches])
+
+    # A collection query takes a single where clause, so searches sharing
+    # the same filters are answered together
+    groups = OrderedDict()
+    for i, search in enumerate(request.searches):
+        where = build_where(search.filters)
+        key = json.dumps(where, sort_keys=True)
+        groups.setdefault(key, (where, []))[1].append(i)
+
+    hit_ids = [None] * len(request.searches)
+    for where, indices in groups.values():
+        with metrics.stage("vector_query"):
+            results = store.vector_index.query(
+                query_embeddings=[embeddings[i] for i in indices],
+                n_results=n_results,
+                where=store.live_where(where),
+                include=["distances"]
+            )
+        for i, ids in zip(indices, results['ids']):
+            hit_ids[i] = ids
+
+    seen_ids = set()
+    bodies = []
+
+    for search, candidates in zip(request.searches, hit_ids):
+        ids = []
+        for activity_id in candidates:
+            if len(ids) >= search.n_results:
+                break
+            if request.dedupe:
+                if activity_id in seen_ids:
+                    continue
+                seen_ids.add(activity_id)
+            ids.append(activity_id)
+
+        with metrics.stage("hydration"):
+            fragments = store.get_fragments(ids)
+        with metrics.stage("serialization"):
+            bodies.append(encode_search_response(fragments, search.query))
+
+    return bodies
+
+
+def run_nearby_search(request: NearbySearchRequest, store: Optional[ActivityStore] = None) -> List[bytes]:
+    """Rank activities inside the search area by blended similarity and distance (blocking)"""
+    store = activity_store if store is None else store
+    store.refresh_if_changed()
+
+    geo_index = store.geo_index
+    if request.bbox is not None:
+        candidates = geo_index.within_bbox(request.bbox)
+        max_distance = max(candidates.values(), default=0.0)
+    else:
+        candidates = geo_index.within_radius(request.latitude, request.longitude, request.radius_km)
+        max_distance = request.radius_km
+
+    if not candidates:
+        return []
+
+    # Closer is better: 1.0 at the centre, 0.0 at the edge of the area
+    geo_scores = {
+        activity_id: 1.0 - distance / max_distance if max_distance > 0 else 1.0
+        for activity_id, distance in candidates.items()
+    }
+
+    where = build_where(request.filters)
+
+    if request.query:
+        query_embeddings = embed_queries([request.query])
+        with metrics.stage("vector_query"):
+            results = store.vector_index.query(
+                query_embeddings=query_embeddings,
+                ids=list(candidates),
+                n_results=len(candidates),
+                where=store.live_where(where),
+                include=["distances"]
+            )
+        ids = results['ids'][0]
+        distances = results['distances'][0]
+
+        # Min-max normalise vector distances within the candidate set so the
+        # score is comparable to the geo score whatever the distance metric
+        low, high = min(distances, default=0.0), max(distances, default=0.0)
+        semantic_scores = {
+            activity_id: 1.0 - (distance - low) / (high - low) if high > low else 1.0
+            for activity_id, distance in zip(ids, distances)
+        }
+        weight = min(max(request.distance_weight, 0.0), 1.0)
+        scores = {
+            activity_id: (1 - weight) * semantic_scores[activity_id] + weight * geo_scores[activity_id]
+            for activity_id in ids
+        }
+    else:
+        ids = list(candidates)
+        if where is not None:
+            ids = store.collection.get(ids=ids, where=where, include=[])['ids']
+        scores = {activity_id: geo_scores[activity_id] for activity_id in ids}
+
+    ranked = sorted(scores, key=scores.get, reverse=True)[:request.n_results]
+    with metrics.stage("hydration"):
+        fragments = store.fragment_map(ranked)
+        return [
+            with_distance(fragments[activity_id], round(candidates[activity_id], 3))
+            for activity_id in ranked if activity_id in fragments
+        ]
+
+
+# Snapshot export
+def export_snapshot(source, directory: str, page_size: int = 500) -> dict:
+    """
+    Write a collection as a memory-mapped snapshot for SERVING_MODE=snapshot
+
+    Each record's flat filter metadata is recomputed from full_data, and its
+    activity JSON, BM25 tokens, collapse key and coordinates are derived
+    once here, so serving workers never parse full_data themselves. Records
+    whose full_data does not parse are left out, as the activity store would
+    skip them too.
+    """
+    ids, embeddings, metadatas, fragments = [], [], [], []
+    lexical_tokens, collapse_keys, coordinates = [], [], []
+    offset = 0
+    while True:
+        page = source.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        if not page['ids']:
+            break
+        for activity_id, embedding, metadata in zip(page['ids'], page['embeddings'], page['metadatas']):
+            try:
+                full_data = json.loads((metadata or {})['full_data'])
+                activity = activity_from_data(full_data, activity_id)
+            except Exception as parse_error:
+                print(f"⚠️ Skipping activity {activity_id}: {parse_error}")
+                continue
+            flat = {key: value for key, value in metadata.items() if not key.startswith("tag:")}
+            flat.update(filter_metadata(full_data))
+            ids.append(activity_id)
+            embeddings.append(np.asarray(embedding, dtype=np.float32))
+            metadatas.append(flat)
+            fragments.append(encode_activity(activity))
+            lexical_tokens.append(tokenize(lexical_text(full_data)))
+            collapse_keys.append(collapse_key(activity_id, full_data))
+            coordinates.append((
+                activity.latitude if activity.latitude is not None else np.nan,
+                activity.longitude if activity.longitude is not None else np.nan
+            ))
+        offset += len(page['ids'])
+
+    space = (source.configuration.get("hnsw") or {}).get("space", "l2")
+    matrix = np.vstack(embeddings) if embeddings else np.zeros((0, embedding_backend.dimensions), dtype=np.float32)
+    return write_snapshot(directory, ids, matrix, metadatas, fragments, space, info={
+        "collection": source.name,
+        "embedding_model": embedding_model
+    }, lexical_tokens=lexical_tokens, collapse_keys=collapse_keys, coordinates=np.asarray(coordinates).reshape(len(ids), 2))
+
+
+# Startup
+readiness = Readiness()
+
+
+def read_collection_manifest() -> Optional[dict]:
+    """The manifest written by chromadb_admin.py publish, if one has been published"""
+    try:
+        with open(collection_manifest_path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def published_version() -> Optional[str]:
+    """Token that changes whenever a new snapshot or collection manifest is published"""
+    if serving_mode == "snapshot":
+        try:
+            with open(os.path.join(snapshot_path, MANIFEST_FILE)) as handle:
+                manifest = json.load(handle)
+        except FileNotFoundError:
+            # Between the two renames of a snapshot being moved into place
+            return None
+        return manifest.get("snapshot_id") or manifest.get("created_at")
+
+    manifest = read_collection_manifest()
+    return json.dumps(manifest, sort_keys=True) if manifest else None
+
+
+def open_snapshot() -> SnapshotCollection:
+    """Map the snapshot at SNAPSHOT_PATH, refusing one embedded with another model"""
+    snapshot = SnapshotCollection(snapshot_path)
+    snapshot_model = snapshot.manifest.get("embedding_model")
+    if snapshot_model and snapshot_model != embedding_model:
+        raise ValueError(f"Snapshot was embedded with {snapshot_model}, bridge embeds with {embedding_model}")
+    return snapshot
+
+
+def open_published_collection():
+    """The snapshot, or the collection named by the manifest (the configured one until something is published)"""
+    if serving_mode == "snapshot":
+        return open_snapshot()
+
+    manifest = read_collection_manifest() or {}
+    # Queries are embedded by the bridge itself, so no embedding function is attached
+    return chroma_client.get_collection(name=manifest.get("collection", collection_name))
+
+
+def connect_collection():
+    """Open the persistent client and serving collection, or the memory-mapped snapshot"""
+    global chroma_client, collection, collection_name
+
+    # Read before opening, so a version published meanwhile is still swapped in later
+    store_swapper.version = published_version()
+
+    if serving_mode == "snapshot":
+        collection = open_snapshot()
+        activity_store.collection = collection
+        print(f"✅ Mapped snapshot of '{collection.name}' from {snapshot_path}")
+        print(f"📊 Collection size: {collection.count()} activities")
+        return
+
+    chroma_client = chromadb.PersistentClient(path=chroma_db_path)
+    collection = open_published_collection()
+    collection_name = collection.name
+    activity_store.collection = collection
+    print(f"✅ Connected to ChromaDB collection: {collection_name}")
+    print(f"📊 Collection size: {collection.count()} activities")
+
+
+def warm_up(store: ActivityStore, record):
+    """Page the vector index in, embed the preference facets and pre-embed the hot queries"""
+    sample = store.collection.get(limit=1, include=["embeddings"])
+    if len(sample['ids']) > 0:
+        n_results = min(10, store.collection.count())
+        for round_number in range(warmup_rounds):
+            started_at = time.perf_counter()
+            store.vector_index.query(
+                query_embeddings=[sample['embeddings'][0]],
+                n_results=n_results,
+                include=["distances"]
+            )
+            record(f"index_probe_{round_number + 1}", started_at)
+
+    started_at = time.perf_counter()
+    preference_facets.precompute()
+    record("preference_facets", started_at)
+
+    # Goes through the real search path so embeddings land in the cache and
+    # the embedding backend's connection is already open for the first user
+    for query in warmup_queries:
+        started_at = time.perf_counter()
+        run_search(SearchRequest(query=query, n_results=10), store)
+        record(f"query:{query}", started_at)
+
+
+def sweep_expired_offers():
+    """Background loop dropping offers from the serving store as they expire"""
+    while True:
+        time.sleep(expiry_sweep_seconds)
+        try:
+            if activity_store.sweep_expired():
+                response_cache.prune(activity_store.fingerprint)
+        except Exception as e:
+            print(f"⚠️ Expiry sweep failed: {e}")
+
+
+def initialize():
+    """Connect, load the activity store and warm up, then mark the bridge ready"""
+    try:
+        readiness.advance("connecting")
+        started_at = time.perf_counter()
+        connect_collection()
+        readiness.record("connect", started_at)
+
+        readiness.advance("loading")
+        started_at = time.perf_counter()
+        activity_store.load()
+        response_cache.prune(activity_store.fingerprint)
+        readiness.record("load", started_at)
+
+        readiness.advance("warming")
+        started_at = time.perf_counter()
+        warm_up(activity_store, readiness.record)
+        readiness.record("warmup", started_at)
+
+        readiness.ready = True
+        readiness.advance("ready")
+        store_swapper.start()
+        if expiry_sweep_seconds > 0:
+            threading.Thread(target=sweep_expired_offers, name="expiry-sweeper", daemon=True).start()
+    except Exception as e:
+        readiness.error = str(e)
+        readiness.advance("failed")
+        print(f"❌ Startup failed: {e}")
+        if startup_mode == "blocking":
+            raise
+
+
+def require_ready():
+    """Reject searches with a 503 until startup has finished warming up"""
+    if not readiness.ready:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Search is not ready yet ({readiness.phase})",
+            headers={"Retry-After": str(search_executor.retry_after_seconds)}
+        )
+
+
+# Blue/green collection swaps
+def promote_store(store: ActivityStore):
+    """Make store the serving store; searches already holding the old one finish on it"""
+    global activity_store, collection, collection_name
+    collection = store.collection
+    if serving_mode != "snapshot":
+        collection_name = store.collection.name
+    activity_store = store
+    response_cache.prune(store.fingerprint)
+
+
+def load_published_store(record) -> ActivityStore:
+    """Open, load and warm the published version next to the serving store"""
+    started_at = time.perf_counter()
+    store = activity_store.replica(open_published_collection())
+    store.load()
+    record("load", started_at)
+
+    started_at = time.perf_counter()
+    warm_up(store, record)
+    record("warmup", started_at)
+    return store
+
+
+store_swapper = StoreSwapper(hot_swap_check_seconds, published_version, load_published_store, promote_store)
+
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
     return {
         "status": "ok",
         "service": "ChromaDB API Bridge",
-        "collection": "telegram_activities",
-        "count": collection.count()
+        "collection": collection_name,
+        "count": len(activity_store)
     }
 
 
 @app.get("/health")
 async def health():
     """Detailed health check"""
+    if not readiness.ready:
+        # The process is up; report startup progress instead of failing the check
+        body = {
+            "status": readiness.phase,
+            "chroma_connected": collection is not None,
+            "collection_name": collection_name,
+            "loaded_activities": len(activity_store),
+            "embedding_backend": embedding_backend.name,
+            "startup": readiness.as_dict()
+        }
+        if readiness.error:
+            raise HTTPException(status_code=503, detail=body)
+        return body
+
     try:
-        count = collection.count()
+        # Off the event loop so a busy search pool never delays health checks
+        count = await asyncio.to_thread(collection.count)
+        store_stats = await asyncio.to_thread(embedding_store.stats) if embedding_store else None
         return {
             "status": "healthy",
             "chroma_connected": True,
-            "collection_name": "telegram_activities",
+            "collection_name": collection_name,
             "activity_count": count,
-            "embedding_model": "text-embedding-3-small"
+            "serving_mode": serving_mode,
+            "loaded_activities": len(activity_store),
+            "store_version": activity_store.version,
+            "store_fingerprint": activity_store.fingerprint,
+            "geo_indexed_activities": len(activity_store.geo_index),
+            "lexical_indexed_activities": len(activity_store.lexical_index),
+            "vector_engine": activity_store.vector_engine_stats(),
+            "expiry": activity_store.expiry_stats(),
+            "embedding_backend": embedding_backend.name,
+            "embedding_model": embedding_model,
+            "embedding_cache": embedding_cache.stats(),
+            "embedding_store": store_stats,
+            "response_cache": response_cache.stats(),
+            "semantic_cache": semantic_cache.stats(),
+            "search_executor": search_executor.stats(),
+            "search_coalescing": search_flights.stats(),
+            "hot_swap": store_swapper.stats(),
+            "startup": readiness.as_dict()
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Health check failed: {str(e)}")
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 only once the index is warm and searches will be fast"""
+    if not readiness.ready:
+        raise HTTPException(status_code=503, detail=readiness.as_dict())
+    return readiness.as_dict()
+
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Prometheus text-format metrics"""
+    lines = metrics.stage_seconds.render() + metrics.request_seconds.render() + metrics.render_requests()
+
+    cache_stats = {
+        "embedding": embedding_cache.stats(),
+        "response": response_cache.stats(),
+        "semantic": semantic_cache.stats()
+    }
+    if embedding_store:
+        # Counting the store's rows scans its table; keep that off the event loop
+        cache_stats["embedding_store"] = await asyncio.to_thread(embedding_store.stats)
+    cache_series = (
+        ("chromadb_bridge_cache_hits_total", "counter", "Cache hits.",
+         lambda stats: stats["hits"] + stats.get("disk_hits", 0)),
+        ("chromadb_bridge_cache_misses_total", "counter", "Cache misses.",
+         lambda stats: stats["misses"]),
+        ("chromadb_bridge_cache_hit_ratio", "gauge", "Cache hit ratio since start.",
+         lambda stats: stats["hit_rate"]),
+        ("chromadb_bridge_cache_evictions_total", "counter", "Cache evictions.",
+         lambda stats: stats["evictions"])
+    )
+    for name, metric_type, help_text, value in cache_series:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+        for cache_name, stats in cache_stats.items():
+            lines.append(f"{name}{format_labels({'cache': cache_name})} {value(stats)}")
+
+    executor_stats = search_executor.stats()
+    lines += [
+        "# HELP chromadb_bridge_search_running Searches executing on the search pool.",
+        "# TYPE chromadb_bridge_search_running gauge",
+        f"chromadb_bridge_search_running {executor_stats['running']}",
+        "# HELP chromadb_bridge_search_queued Searches waiting for the search pool.",
+        "# TYPE chromadb_bridge_search_queued gauge",
+        f"chromadb_bridge_search_queued {executor_stats['queued']}",
+        "# HELP chromadb_bridge_search_rejected_total Searches shed because the queue was full.",
+        "# TYPE chromadb_bridge_search_rejected_total counter",
+        f"chromadb_bridge_search_rejected_total {executor_stats['rejected']}",
+        "# HELP chromadb_bridge_search_coalesced_total Searches answered by joining an identical in-flight search.",
+        "# TYPE chromadb_bridge_search_coalesced_total counter"
+    ]
+    lines += [
+        f"chromadb_bridge_search_coalesced_total{format_labels({'endpoint': endpoint})} {count}"
+        for endpoint, count in sorted(search_flights.coalesced.items())
+    ]
+    lines += [
+        "# HELP chromadb_bridge_store_swaps_total Published collections swapped in without a restart.",
+        "# TYPE chromadb_bridge_store_swaps_total counter",
+        f"chromadb_bridge_store_swaps_total{format_labels({'result': 'ok'})} {store_swapper.swaps}",
+        f"chromadb_bridge_store_swaps_total{format_labels({'result': 'failed'})} {store_swapper.failures}",
+        "# HELP chromadb_bridge_collection_size Activities loaded in the serving store.",
+        "# TYPE chromadb_bridge_collection_size gauge",
+        f"chromadb_bridge_collection_size {len(activity_store)}"
+    ]
+
+    return Response(content="\n".join(lines) + "\n", media_type="text/plain; version=0.0.4")
+
+
 @app.post("/search", response_model=SearchResponse)
 async def search_activities(request: SearchRequest):
     """
     Search for activities using semantic similarity
 
+    mode=vector ranks by embedding similarity, mode=keyword by BM25 over
+    title, venue, tags and search keywords (no embedding call), and
+    mode=hybrid fuses both rankings with reciprocal-rank fusion. A diversity
+    between 0 and 1 over-fetches candidates and re-ranks them with Maximal
+    Marginal Relevance so near-duplicates do not crowd out the top k.
+
+    Args:
+        request: SearchRequest with query, n_results, filters and mode
+
+    Returns:
+        SearchResponse with list of matching activities
+    """
+    require_ready()
+
+    if request.diversity is not None and request.mode == "keyword":
+        raise HTTPException(status_code=400, detail="diversity requires mode=vector or mode=hybrid")
+
+    try:
+        await refresh_store_if_due()
+
+        cache_key = response_cache.key("search", request, activity_store.fingerprint)
+        body = await response_cache.lookup(cache_key)
+        if body is not None:
+            print(f"⚡ Cache hit for: '{request.query}' (top {request.n_results}, {request.mode})")
+            return json_response(body)
+
+        print(f"🔍 Searching for: '{request.query}' (top {request.n_results}, {request.mode})")
+
+        fragments = await search_flights.run("search", flight_key(request), search_executor.run, run_search, request)
+
+        print(f"✅ Found {len(fragments)} activities")
+
+        with metrics.stage("serialization"):
+            body = encode_search_response(fragments, request.query)
+        response_cache.put(cache_key, body)
+        return json_response(body)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+
+
+@app.post("/search/preferences", response_model=SearchResponse)
+async def search_activities_by_preferences(request: PreferenceSearchRequest):
+    """
+    Search with structured preferences instead of a concatenated keyword string
+
+    Budget, group size, MBTI and spicy facets use keyword-set embeddings
+    computed once at startup; only the free-text query and activity names
+    are embedded per request. The vectors are combined by weighted sum
+    (PREFERENCE_FACET_WEIGHTS, overridable per request via weights).
+
     Args:
-        request: SearchRequest with query and n_results
+        request: PreferenceSearchRequest with the keywords.ts preference fields
 
     Returns:
         SearchResponse with list of matching activities
     """
+    require_ready()
+
+    if request.weights:
+        unknown = sorted(set(request.weights) - set(PREFERENCE_FACET_WEIGHTS))
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown facet weights: {', '.join(unknown)}")
+    active_weights = PreferenceFacets.active_weights(request)
+    if not active_weights:
+        raise HTTPException(status_code=400, detail="Provide a query or at least one preference")
+    if sum(active_weights.values()) <= 0:
+        raise HTTPException(status_code=400, detail="Weights of the query and selected preferences must not sum to zero")
+
     try:
-        print(f"🔍 Searching for: '{request.query}' (top {request.n_results})")
+        await refresh_store_if_due()
+
+        cache_key = response_cache.key("search/preferences", request, activity_store.fingerprint)
+        body = await response_cache.lookup(cache_key)
+        if body is not None:
+            print(f"⚡ Cache hit for preferences: '{request.query}' (top {request.n_results})")
+            return json_response(body)
+
+        print(f"🎛️  Preference search for: '{request.query}' (top {request.n_results})")
 
-        # Query ChromaDB
-        results = collection.query(
-            query_texts=[request.query],
-            n_results=request.n_results
+        fragments = await search_flights.run(
+            "search/preferences", flight_key(request), search_executor.run, run_preference_search, request
         )
 
-        # Parse activities from metadata
-        activities = []
+        print(f"✅ Found {len(fragments)} activities")
 
-        for i in range(len(results['ids'][0])):
-            try:
-                metadata = results['metadatas'][0][i]
+        with metrics.stage("serialization"):
+            body = encode_search_response(fragments, request.query)
+        response_cache.put(cache_key, body)
+        return json_response(body)
 
-                if not metadata or 'full_data' not in metadata:
-                    continue
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Preference search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Preference search failed: {str(e)}")
 
-                # Parse full_data JSON string
-                full_data = json.loads(metadata['full_data'])
 
-                # Parse source_link (it's stored as a JSON array string)
-                source_link_raw = full_data.get('source_link')
-                source_link = None
-                if source_link_raw:
-                    try:
-                        # Try to parse as JSON array and get first link
-                        links = json.loads(source_link_raw)
-                        if isinstance(links, list) and len(links) > 0:
-                            source_link = links[0]
-                        else:
-                            source_link = source_link_raw
-                    except:
-                        # If not JSON, use as is
-                        source_link = source_link_raw
-
-                # Create Activity object
-                activity = Activity(
-                    title=full_data.get('title', 'Untitled'),
-                    description=full_data.get('description', ''),
-                    location=full_data.get('location', 'Singapore'),
-                    venue_name=full_data.get('venue_name', ''),
-                    price=full_data.get('price'),
-                    tags=full_data.get('tags', []),
-                    duration_hours=full_data.get('duration_hours'),
-                    offer_type=full_data.get('offer_type', 'activity'),
-                    validity_end=full_data.get('validity_end'),
-                    source_channel=full_data.get('source_channel', ''),
-                    source_type=full_data.get('source_type', ''),
-                    source_link=source_link,
-                    latitude=full_data.get('latitude'),
-                    longitude=full_data.get('longitude')
-                )
-
-                activities.append(activity)
+@app.post("/search/batch", response_model=BatchSearchResponse)
+async def search_activities_batch(request: BatchSearchRequest):
+    """
+    Run several searches in one round trip
+
+    All query texts are embedded in a single embeddings call and answered by
+    a single multi-query collection lookup.
 
-            except Exception as parse_error:
-                print(f"⚠️ Error parsing activity {i}: {parse_error}")
-                continue
+    Args:
+        request: BatchSearchRequest with the searches and dedupe flag
+
+    Returns:
+        BatchSearchResponse with one result list per search, in request order
+    """
+    require_ready()
+
+    if any(search.mode != "vector" for search in request.searches):
+        raise HTTPException(status_code=400, detail="Batch searches only support mode=vector")
+    if any(search.collapse or search.diversity is not None for search in request.searches):
+        raise HTTPException(status_code=400, detail="Batch searches do not support collapse or diversity")
+
+    try:
+        await refresh_store_if_due()
+
+        cache_key = response_cache.key("search/batch", request, activity_store.fingerprint)
+        body = await response_cache.lookup(cache_key)
+        if body is not None:
+            print(f"⚡ Cache hit for batch of {len(request.searches)} queries")
+            return json_response(body)
+
+        print(f"🔍 Batch searching {len(request.searches)} queries (dedupe={request.dedupe})")
+
+        bodies = await search_flights.run("search/batch", flight_key(request), search_executor.run, run_batch_search, request)
+
+        print(f"✅ Answered {len(bodies)} searches")
+
+        with metrics.stage("serialization"):
+            body = encode_batch_response(bodies)
+        response_cache.put(cache_key, body)
+        return json_response(body)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Batch search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Batch search failed: {str(e)}")
+
+
+@app.post("/search/nearby", response_model=NearbySearchResponse)
+async def search_activities_nearby(request: NearbySearchRequest):
+    """
+    Search for activities inside a radius or bounding box
+
+    Candidates come from the in-memory spatial index; with a query they are
+    ranked by a blend of semantic similarity and distance, otherwise by
+    distance alone.
+
+    Args:
+        request: NearbySearchRequest with a point and radius or a bbox
+
+    Returns:
+        NearbySearchResponse with activities and their distance in km
+    """
+    if request.bbox is None and (request.latitude is None or request.longitude is None):
+        raise HTTPException(status_code=400, detail="Provide latitude and longitude, or a bbox")
+    if request.bbox is not None:
+        bbox = request.bbox
+        if bbox.min_latitude > bbox.max_latitude or bbox.min_longitude > bbox.max_longitude:
+            raise HTTPException(status_code=400, detail="bbox minimums must not exceed its maximums")
+        center_lat = (bbox.min_latitude + bbox.max_latitude) / 2
+        height_km = haversine_km(bbox.min_latitude, 0.0, bbox.max_latitude, 0.0)
+        width_km = haversine_km(center_lat, bbox.min_longitude, center_lat, bbox.max_longitude)
+        if bbox.max_longitude - bbox.min_longitude > 180 or max(height_km, width_km) > 2 * nearby_max_radius_km:
+            raise HTTPException(status_code=400, detail=f"bbox sides must be at most {2 * nearby_max_radius_km:g} km")
 
-        print(f"✅ Found {len(activities)} activities")
+    require_ready()
 
-        return SearchResponse(
-            activities=activities,
-            query=request.query,
-            count=len(activities)
+    try:
+        await refresh_store_if_due()
+
+        cache_key = response_cache.key("search/nearby", request, activity_store.fingerprint)
+        body = await response_cache.lookup(cache_key)
+        if body is not None:
+            print(f"⚡ Cache hit for nearby: '{request.query or ''}' (top {request.n_results})")
+            return json_response(body)
+
+        print(f"📍 Nearby search for: '{request.query or ''}' (top {request.n_results})")
+
+        fragments = await search_flights.run("search/nearby", flight_key(request), search_executor.run, run_nearby_search, request)
+
+        print(f"✅ Found {len(fragments)} nearby activities")
+
+        with metrics.stage("serialization"):
+            body = encode_search_response(fragments, request.query)
+        response_cache.put(cache_key, body)
+        return json_response(body)
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        print(f"❌ Nearby search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Nearby search failed: {str(e)}")
+
+
+@app.post("/activities/{activity_id}/similar", response_model=SearchResponse)
+async def similar_activities(activity_id: str, request: Optional[SimilarSearchRequest] = None):
+    """
+    Find activities like one that is already shown
+
+    The activity's stored embedding is the query vector, so no embedding
+    call is made. The activity itself is left out, and with collapse so is
+    every other hit from its venue.
+
+    Args:
+        activity_id: Collection id of the activity (the id field of a result)
+        request: Optional SimilarSearchRequest with n_results, filters and collapse
+
+    Returns:
+        SearchResponse with similar activities; query holds the activity id
+    """
+    require_ready()
+    request = request or SimilarSearchRequest()
+
+    try:
+        await refresh_store_if_due()
+
+        endpoint = f"activities/{activity_id}/similar"
+        cache_key = response_cache.key(endpoint, request, activity_store.fingerprint)
+        body = await response_cache.lookup(cache_key)
+        if body is not None:
+            print(f"⚡ Cache hit for similar to: {activity_id} (top {request.n_results})")
+            return json_response(body)
+
+        print(f"🔁 Similar to: {activity_id} (top {request.n_results})")
+
+        fragments = await search_flights.run(
+            "activities/similar", f"{activity_id}|{flight_key(request)}",
+            search_executor.run, run_similar_search, activity_id, request
         )
+        if fragments is None:
+            raise HTTPException(status_code=404, detail=f"Activity not found: {activity_id}")
+
+        print(f"✅ Found {len(fragments)} similar activities")
 
+        with metrics.stage("serialization"):
+            body = encode_search_response(fragments, activity_id)
+        response_cache.put(cache_key, body)
+        return json_response(body)
+
+    except HTTPException:
+        raise
     except Exception as e:
-        print(f"❌ Search error: {e}")
-        raise HTTPException(status_code=500, detail=f"Search failed: {str(e)}")
+        print(f"❌ Similar search error: {e}")
+        raise HTTPException(status_code=500, detail=f"Similar search failed: {str(e)}")
 
 
 if __name__ == "__main__":
@@ -208,9 +2068,22 @@ if __name__ == "__main__":
     print("\n" + "="*60)
     print("🚀 Starting ChromaDB API Bridge")
     print("="*60)
-    print(f"📍 ChromaDB path: {chroma_db_path}")
+    if serving_mode == "snapshot":
+        print(f"🗺️  Snapshot: {snapshot_path} (memory-mapped, read-only)")
+    else:
+        print(f"📍 ChromaDB path: {chroma_db_path}")
+        print(f"🗂️  Collection: {collection_name}")
+    print(f"🧠 Embedding backend: {embedding_backend.name} ({embedding_model})")
     print(f"🔑 OpenAI API key: {'✓ Set' if api_key else '✗ Not set'}")
+    print(f"👷 Workers: {web_concurrency}")
     print(f"🌐 Server will run on: http://0.0.0.0:{port}")
     print("="*60 + "\n")
 
-    uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
+    if web_concurrency > 1:
+        # Each PersistentClient holds its own index copy, so only the shared
+        # read-only snapshot scales out
+        if serving_mode != "snapshot":
+            raise SystemExit("WEB_CONCURRENCY > 1 requires SERVING_MODE=snapshot")
+        uvicorn.run("chromadb_api:app", host="0.0.0.0", port=port, log_level="info", workers=web_concurrency)
+    else:
+        uvicorn.run(app, host="0.0.0.0", port=port, log_level="info")
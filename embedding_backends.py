@@ -0,0 +1,119 @@
+"""
+Query/document embedding backends for the ChromaDB bridge
+
+The bridge and the admin tools pick a backend by name so the search stack
+can run against OpenAI in production or fully offline on a local CPU
+backend. Every backend returns one float32 vector per input text.
+"""
+
+from typing import List
+import zlib
+
+import numpy as np
+from chromadb.utils import embedding_functions
+
+
+class EmbeddingBackend:
+    """Base class for embedding backends"""
+
+    name = "base"
+
+    def __init__(self, model_name: str, dimensions: int):
+        self.model_name = model_name
+        self.dimensions = dimensions
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        raise NotImplementedError
+
+    def __call__(self, texts: List[str]) -> List[np.ndarray]:
+        return self.embed(texts)
+
+
+class OpenAIBackend(EmbeddingBackend):
+    """
+    OpenAI embeddings API (network call per batch)
+
+    dimensions is sent with every request, so text-embedding-3 models return
+    shortened vectors of that size; left unset, the model's full size is used.
+    Shortened vectors get their own model_name, since caches and snapshots
+    must not mix them with full-size ones.
+    """
+
+    name = "openai"
+
+    def __init__(self, api_key: str, model_name: str = "text-embedding-3-small", dimensions: int = None):
+        if not api_key:
+            raise ValueError("OPENAI_API_KEY environment variable not set")
+
+        super().__init__(f"{model_name}-{dimensions}" if dimensions else model_name, dimensions or 1536)
+        self._function = embedding_functions.OpenAIEmbeddingFunction(
+            api_key=api_key,
+            model_name=model_name,
+            dimensions=dimensions
+        )
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        return [np.asarray(vector, dtype=np.float32) for vector in self._function(texts)]
+
+
+class HashedNgramBackend(EmbeddingBackend):
+    """
+    Local feature-hashing embedder over words, word bigrams and character trigrams
+
+    Deterministic across processes and machines, needs no model files or
+    network, and embeds a typical query in well under a millisecond. It
+    captures lexical overlap rather than meaning, which is what offline
+    load tests and isolated environments need.
+    """
+
+    name = "hashed"
+
+    def __init__(self, dimensions: int = 384):
+        super().__init__(f"hashed-ngram-{dimensions}", dimensions)
+
+    def _features(self, text: str):
+        words = text.lower().split()
+        for word in words:
+            yield "w:" + word, 1.0
+            padded = f"<{word}>"
+            for i in range(len(padded) - 2):
+                yield "c:" + padded[i:i + 3], 0.5
+        for first, second in zip(words, words[1:]):
+            yield f"b:{first} {second}", 0.5
+
+    def embed(self, texts: List[str]) -> List[np.ndarray]:
+        vectors = []
+        for text in texts:
+            vector = np.zeros(self.dimensions, dtype=np.float32)
+            for feature, weight in self._features(text):
+                digest = zlib.crc32(feature.encode("utf-8"))
+                sign = 1.0 if (digest // self.dimensions) & 1 else -1.0
+                vector[digest % self.dimensions] += sign * weight
+
+            norm = np.linalg.norm(vector)
+            if norm > 0:
+                vector /= norm
+            vectors.append(vector)
+        return vectors
+
+
+def create_embedding_backend(name: str, api_key: str = None, model_name: str = None,
+                             dimensions: int = None) -> EmbeddingBackend:
+    """Build the backend registered under name"""
+    if name == OpenAIBackend.name:
+        return OpenAIBackend(
+            api_key=api_key,
+            model_name=model_name or "text-embedding-3-small",
+            dimensions=dimensions
+        )
+    if name == HashedNgramBackend.name:
+        return HashedNgramBackend(dimensions=dimensions or 384)
+
+    raise ValueError(f"Unknown embedding backend: {name}")
+
+
+def default_collection_name(backend_name: str) -> str:
+    """Collection holding vectors for a backend; OpenAI keeps the original collection"""
+    if backend_name == OpenAIBackend.name:
+        return "telegram_activities"
+    return f"telegram_activities_{backend_name}"
@@ -0,0 +1,203 @@
+"""
+Persistent, content-addressed embedding store for the ChromaDB bridge
+
+Vectors live in one SQLite file keyed by (model, dimensions, sha256(text)),
+so a restarted or redeployed bridge, and every worker of a multi-worker
+one, reuses embeddings that were already paid for. The file runs in WAL
+mode: any number of processes read while one writes. Each row remembers
+when it was last used, and once the live data outgrows max_bytes the least
+recently used rows are deleted.
+
+The store is a cache: a locked or unreadable file is reported and treated
+as a miss, never as a failed search. A file that cannot be opened at all
+disables the store for the life of the process.
+"""
+
+from typing import Dict, List
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+import numpy as np
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model TEXT NOT NULL,
+    dimensions INTEGER NOT NULL,
+    digest BLOB NOT NULL,
+    vector BLOB NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (model, dimensions, digest)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS embeddings_last_used ON embeddings (last_used);
+"""
+
+
+def text_digest(text: str) -> bytes:
+    return hashlib.sha256(text.encode("utf-8")).digest()
+
+
+class EmbeddingStore:
+    """
+    SQLite-backed embedding cache shared across restarts and processes
+
+    Reads refresh a row's last_used at most once per touch_seconds, so a
+    hot query does not turn every lookup into a write. After each write
+    the store trims itself to evict_to * max_bytes once the pages in use
+    exceed max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int, touch_seconds: float = 3600.0, evict_to: float = 0.9,
+                 busy_timeout_seconds: float = 2.0):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.touch_seconds = touch_seconds
+        self.evict_to = evict_to
+        self.busy_timeout_seconds = busy_timeout_seconds
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.errors = 0
+        self.enabled = True
+
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._connection().executescript(SCHEMA)
+        except (OSError, sqlite3.Error) as e:
+            self.enabled = False
+            self.errors += 1
+            print(f"⚠️ Embedding store disabled, cannot open {path}: {e}")
+
+    def _connection(self) -> sqlite3.Connection:
+        # One connection per thread; sqlite3 connections are not shared across threads
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout_seconds, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    def _count(self, field: str, amount: int = 1):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + amount)
+
+    def get_many(self, model: str, dimensions: int, texts: List[str]) -> Dict[str, np.ndarray]:
+        """Stored vectors for whichever of the texts have one"""
+        if not texts or not self.enabled:
+            return {}
+
+        digests = {text_digest(text): text for text in dict.fromkeys(texts)}
+        try:
+            connection = self._connection()
+            placeholders = ",".join("?" * len(digests))
+            rows = connection.execute(
+                f"SELECT digest, vector, last_used FROM embeddings "
+                f"WHERE model = ? AND dimensions = ? AND digest IN ({placeholders})",
+                [model, dimensions, *digests]
+            ).fetchall()
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"⚠️ Embedding store read failed: {e}")
+            return {}
+
+        found = {digests[digest]: np.frombuffer(vector, dtype=np.float32) for digest, vector, _ in rows}
+        self._count("hits", len(found))
+        self._count("misses", len(digests) - len(found))
+
+        now = time.time()
+        stale = [digest for digest, _, last_used in rows if now - last_used >= self.touch_seconds]
+        if stale:
+            try:
+                connection.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND dimensions = ? AND digest = ?",
+                    [(now, model, dimensions, digest) for digest in stale]
+                )
+            except sqlite3.Error:
+                # Another process holds the write lock; the next read retries
+                self._count("errors")
+        return found
+
+    def put_many(self, model: str, dimensions: int, vectors: Dict[str, np.ndarray]):
+        if not vectors or self.max_bytes <= 0 or not self.enabled:
+            return
+
+        now = time.time()
+        rows = [
+            (model, dimensions, text_digest(text), np.asarray(vector, dtype=np.float32).tobytes(), now)
+            for text, vector in vectors.items()
+        ]
+        try:
+            connection = self._connection()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, dimensions, digest, vector, last_used) VALUES (?, ?, ?, ?, ?)",
+                    rows
+                )
+                self._evict(connection)
+                connection.execute("COMMIT")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+        except sqlite3.Error as e:
+            self._count("errors")
+            print(f"⚠️ Embedding store write failed: {e}")
+            return
+        self._count("writes", len(rows))
+
+    def _used_bytes(self, connection: sqlite3.Connection) -> int:
+        page_size = connection.execute("PRAGMA page_size").fetchone()[0]
+        page_count = connection.execute("PRAGMA page_count").fetchone()[0]
+        free_pages = connection.execute("PRAGMA freelist_count").fetchone()[0]
+        return (page_count - free_pages) * page_size
+
+    def _evict(self, connection: sqlite3.Connection):
+        """Delete least recently used rows until the live pages fit the budget again"""
+        used = self._used_bytes(connection)
+        if used <= self.max_bytes:
+            return
+
+        rows = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        # Rows are close to the same size, so trim the same share of them
+        excess = rows - int(rows * self.evict_to * self.max_bytes / used)
+        if excess <= 0:
+            return
+        connection.execute(
+            "DELETE FROM embeddings WHERE (model, dimensions, digest) IN "
+            "(SELECT model, dimensions, digest FROM embeddings ORDER BY last_used LIMIT ?)",
+            (excess,)
+        )
+        self._count("evictions", excess)
+
+    def stats(self) -> dict:
+        """Counters plus the file's row count and size; the count scans the table, so call it off the event loop"""
+        rows, used = None, None
+        if self.enabled:
+            try:
+                connection = self._connection()
+                rows = connection.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                used = self._used_bytes(connection)
+            except sqlite3.Error:
+                pass
+
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "path": self.path,
+                "enabled": self.enabled,
+                "rows": rows,
+                "bytes": used,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "writes": self.writes,
+                "evictions": self.evictions,
+                "errors": self.errors,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
@@ -0,0 +1,46 @@
+"""
+Flat filter metadata shared by the ChromaDB bridge and its admin CLI
+
+Filterable fields are flattened out of full_data into top-level metadata
+keys so ChromaDB can prune candidates itself. Chroma metadata cannot hold
+lists or nulls, so tags become one boolean key each and a missing expiry
+is stored as a far-future date. Nothing here touches ChromaDB.
+"""
+
+from typing import Optional
+
+from offer_dates import NO_EXPIRY_ORDINAL, date_ordinal
+
+FILTER_SCHEMA_VERSION = 1
+
+
+def tag_key(tag: str) -> str:
+    return f"tag:{tag.strip().lower()}"
+
+
+def filter_metadata(full_data: dict) -> dict:
+    """Flat, Chroma-filterable metadata fields for a full_data record"""
+    metadata = {
+        "filter_schema": FILTER_SCHEMA_VERSION,
+        "offer_type": (full_data.get('offer_type') or 'activity').lower(),
+        "source_type": (full_data.get('source_type') or '').lower(),
+        "validity_end_ord": date_ordinal(full_data.get('validity_end')) or NO_EXPIRY_ORDINAL,
+        "has_price": full_data.get('price') is not None
+    }
+    if metadata["has_price"]:
+        metadata["price"] = float(full_data['price'])
+    for tag in full_data.get('tags') or []:
+        metadata[tag_key(tag)] = True
+    return metadata
+
+
+def stale_filter_fields(metadata: dict, full_data: dict) -> Optional[dict]:
+    """Metadata update that brings a record's filter fields in line with full_data, or None if current"""
+    expected = filter_metadata(full_data)
+    update = {key: value for key, value in expected.items() if metadata.get(key) != value}
+    # Drop tag keys that no longer match the record's tags
+    update.update({
+        key: None for key in metadata
+        if key.startswith("tag:") and key not in expected
+    })
+    return update or None
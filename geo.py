@@ -0,0 +1,99 @@
+"""
+Spatial index for the ChromaDB bridge's nearby search
+
+A uniform latitude/longitude grid answers radius and bounding-box lookups
+by visiting only the cells that can hold matches; distances are
+great-circle kilometres.
+"""
+
+import math
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LATITUDE = 111.32
+
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in kilometres"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+class GeoGridIndex:
+    """
+    Uniform lat/lng grid over activity coordinates
+
+    Radius and bounding-box lookups only visit the cells overlapping the
+    search area, or only the occupied cells when the area spans more cells
+    than that, so cost is bounded by the smaller of the two.
+    """
+
+    def __init__(self, cell_degrees: float):
+        self.cell_degrees = cell_degrees
+        self._cells = {}
+        self._points = {}
+
+    def __len__(self):
+        return len(self._points)
+
+    def _cell(self, latitude: float, longitude: float):
+        return (math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees))
+
+    def add(self, activity_id: str, latitude: float, longitude: float):
+        self._points[activity_id] = (latitude, longitude)
+        self._cells.setdefault(self._cell(latitude, longitude), []).append(activity_id)
+
+    def without(self, ids) -> "GeoGridIndex":
+        """A new index holding every point except ids"""
+        geo_index = GeoGridIndex(self.cell_degrees)
+        for activity_id, (latitude, longitude) in self._points.items():
+            if activity_id not in ids:
+                geo_index.add(activity_id, latitude, longitude)
+        return geo_index
+
+    def _scan(self, min_latitude: float, min_longitude: float, max_latitude: float, max_longitude: float):
+        min_row, min_col = self._cell(min_latitude, min_longitude)
+        max_row, max_col = self._cell(max_latitude, max_longitude)
+        if (max_row - min_row + 1) * (max_col - min_col + 1) > len(self._cells):
+            cells = (
+                ids for (row, col), ids in self._cells.items()
+                if min_row <= row <= max_row and min_col <= col <= max_col
+            )
+        else:
+            cells = (
+                self._cells.get((row, col), ())
+                for row in range(min_row, max_row + 1) for col in range(min_col, max_col + 1)
+            )
+        for ids in cells:
+            for activity_id in ids:
+                yield activity_id, self._points[activity_id]
+
+    def within_radius(self, latitude: float, longitude: float, radius_km: float) -> dict:
+        """Ids within radius_km of the point, mapped to their distance in km"""
+        lat_span = radius_km / KM_PER_DEGREE_LATITUDE
+        lon_span = radius_km / (KM_PER_DEGREE_LATITUDE * max(math.cos(math.radians(latitude)), 1e-6))
+
+        matches = {}
+        for activity_id, (lat, lon) in self._scan(
+            latitude - lat_span, longitude - lon_span, latitude + lat_span, longitude + lon_span
+        ):
+            distance = haversine_km(latitude, longitude, lat, lon)
+            if distance <= radius_km:
+                matches[activity_id] = distance
+        return matches
+
+    def within_bbox(self, bbox) -> dict:
+        """Ids inside the box (any object with min/max latitude and longitude), mapped to their distance in km from its centre"""
+        center_lat = (bbox.min_latitude + bbox.max_latitude) / 2
+        center_lon = (bbox.min_longitude + bbox.max_longitude) / 2
+
+        matches = {}
+        for activity_id, (lat, lon) in self._scan(
+            bbox.min_latitude, bbox.min_longitude, bbox.max_latitude, bbox.max_longitude
+        ):
+            if bbox.min_latitude <= lat <= bbox.max_latitude and bbox.min_longitude <= lon <= bbox.max_longitude:
+                matches[activity_id] = haversine_km(center_lat, center_lon, lat, lon)
+        return matches
@@ -0,0 +1,107 @@
+"""
+Keyword search for the ChromaDB bridge
+
+An Okapi BM25 index over activity text, built in-process or mapped from a
+snapshot's prebuilt postings, so exact venue names and neighbourhoods
+match without an embedding call.
+"""
+
+from typing import List, Optional
+import re
+
+import numpy as np
+
+from mmap_snapshot import lexical_postings
+
+
+def tokenize(text: str) -> List[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+
+def lexical_text(full_data: dict) -> str:
+    """Text indexed for keyword search; title and venue are repeated to weight them up"""
+    title = full_data.get('title') or ''
+    venue = full_data.get('venue_name') or ''
+    return " ".join([
+        title, title,
+        venue, venue,
+        " ".join(full_data.get('tags') or []),
+        full_data.get('search_keywords') or ''
+    ])
+
+
+class BM25Index:
+    """
+    Okapi BM25 inverted index built in-process over activity text
+
+    Answers keyword queries without any network call, so exact venue names
+    and neighbourhoods can be matched with zero embedding latency. Postings
+    are flat arrays (see lexical_postings), so a snapshot's memory-mapped
+    postings are searched in place with from_arrays().
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._ids = []
+        self._docs = {}
+        self._removed = frozenset()
+        self._vocabulary = {}
+        self._offsets = np.zeros(1, dtype=np.int64)
+        self._postings = np.zeros(0, dtype=np.int32)
+        self._counts = np.zeros(0, dtype=np.int32)
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._idf = np.zeros(0)
+        self._avg_length = 0.0
+
+    def __len__(self):
+        return len(self._ids) - len(self._removed)
+
+    def build(self, texts: dict):
+        """Index an id -> text mapping, replacing any previous contents"""
+        ids = list(texts)
+        return self.from_arrays(ids, None, *lexical_postings([tokenize(texts[activity_id]) for activity_id in ids]))
+
+    def from_arrays(self, ids: List[str], docs: Optional[dict], vocabulary: List[str], offsets: np.ndarray,
+                    postings: np.ndarray, counts: np.ndarray, lengths: np.ndarray):
+        """Use prebuilt postings; docs maps id -> document number and defaults to the order of ids"""
+        self._ids = ids
+        self._docs = docs if docs is not None else {activity_id: doc for doc, activity_id in enumerate(ids)}
+        self._removed = frozenset()
+        self._vocabulary = {token: i for i, token in enumerate(vocabulary)}
+        self._offsets = offsets
+        self._postings = postings
+        self._counts = counts
+        self._lengths = lengths
+
+        total = len(ids)
+        self._avg_length = float(lengths.sum()) / total if total else 0.0
+        frequencies = np.diff(offsets).astype(np.float64)
+        self._idf = np.log(1 + (total - frequencies + 0.5) / (frequencies + 0.5))
+        return self
+
+    def remove(self, ids: List[str]):
+        """Leave ids out of later searches; term statistics keep counting them until the next build"""
+        self._removed = self._removed | {self._docs[activity_id] for activity_id in ids if activity_id in self._docs}
+
+    def search(self, query: str, n_results: int) -> List[tuple]:
+        """Top (id, score) pairs for the query, best first"""
+        scores = np.zeros(len(self._ids))
+        for token in set(tokenize(query)):
+            index = self._vocabulary.get(token)
+            if index is None:
+                continue
+            start, end = self._offsets[index], self._offsets[index + 1]
+            # A token lists each document once, so plain fancy-index adds are safe
+            docs = self._postings[start:end]
+            counts = self._counts[start:end].astype(np.float64)
+            norm = self.k1 * (1 - self.b + self.b * self._lengths[docs] / self._avg_length)
+            scores[docs] += self._idf[index] * counts * (self.k1 + 1) / (counts + norm)
+
+        removed = self._removed
+        if removed:
+            scores[np.fromiter(removed, dtype=np.int64, count=len(removed))] = 0.0
+        # Every matching document scores above zero, since idf is always positive
+        hits = np.flatnonzero(scores > 0)
+        ranked = hits[np.argsort(-scores[hits], kind="stable")][:n_results]
+        return [(self._ids[doc], float(scores[doc])) for doc in ranked]
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+"""
+Black-box load generator for a running ChromaDB API bridge
+
+Replays a weighted mix of the preference profiles from test_chroma_api.py
+at open-loop arrival rates: requests are sent on a Poisson schedule
+whether or not earlier ones have finished, and latency is measured from
+each request's scheduled send time, so a slow server cannot hide its own
+queueing. Each rate step reports throughput, latency percentiles and
+error rates, and the run fails if any step breaks the SLO thresholds.
+
+    python loadtest_chroma_api.py --rate 5 --rate 10 --rate 20 --duration 60 --slo-p95-ms 500
+"""
+
+from collections import Counter
+import asyncio
+import json
+import os
+import random
+import time
+
+import click
+import httpx
+import numpy as np
+
+from test_chroma_api import TEST_PROFILES, build_semantic_keywords
+
+# The TEST CASE profiles from test_chroma_api.py; DEFAULT_MIX sets their share of traffic
+PROFILES = TEST_PROFILES
+DEFAULT_MIX = "romantic_date=3,introvert=2,luxury=1,family=2,adventure=1,culture=1"
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in PROFILES:
+            raise click.BadParameter(f"Unknown profile '{name}' (choose from {', '.join(PROFILES)})", param_hint="--mix")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def request_body(endpoint: str, profile: dict, n_results: int, nonce: str = None) -> dict:
+    """Body the Next.js route would send for a profile"""
+    profile = dict(profile)
+    if nonce:
+        # Makes every request unique so response caches cannot answer it
+        profile['query'] = f"{profile['query']} {nonce}"
+    if endpoint == "preferences":
+        return {**profile, 'n_results': n_results}
+    return {'query': build_semantic_keywords(profile), 'n_results': n_results}
+
+
+def summarize(latencies, errors: Counter, sent: int, elapsed: float) -> dict:
+    values = np.asarray(latencies, dtype=np.float64) * 1000
+    ok = len(latencies)
+    failed = sum(errors.values())
+    summary = {
+        "sent": sent,
+        "ok": ok,
+        "failed": failed,
+        "error_rate": round(failed / sent, 4) if sent else 0.0,
+        "errors": dict(errors),
+        "throughput_rps": round(ok / elapsed, 2) if elapsed else 0.0
+    }
+    if ok:
+        summary.update({
+            "p50_ms": round(float(np.percentile(values, 50)), 2),
+            "p90_ms": round(float(np.percentile(values, 90)), 2),
+            "p95_ms": round(float(np.percentile(values, 95)), 2),
+            "p99_ms": round(float(np.percentile(values, 99)), 2),
+            "max_ms": round(float(values.max()), 2)
+        })
+    return summary
+
+
+async def send(client: httpx.AsyncClient, path: str, body: dict, scheduled_at: float, profile: str, results: dict):
+    loop = asyncio.get_running_loop()
+    try:
+        response = await client.post(path, json=body)
+        if response.status_code == 200:
+            latency = loop.time() - scheduled_at
+            results["latencies"].append(latency)
+            results["by_profile"].setdefault(profile, []).append(latency)
+        else:
+            results["errors"][f"http_{response.status_code}"] += 1
+    except httpx.TimeoutException:
+        results["errors"]["timeout"] += 1
+    except httpx.HTTPError as e:
+        results["errors"][type(e).__name__] += 1
+
+
+async def run_step(client: httpx.AsyncClient, path: str, rate: float, duration: float, bodies: list,
+                   weights: list, rng: random.Random, max_in_flight: int) -> dict:
+    """Send Poisson arrivals at rate for duration seconds and wait for every response"""
+    loop = asyncio.get_running_loop()
+    results = {"latencies": [], "errors": Counter(), "by_profile": {}}
+    tasks = set()
+    sent = 0
+
+    start = loop.time()
+    scheduled_at = start
+    while True:
+        scheduled_at += rng.expovariate(rate)
+        if scheduled_at - start > duration:
+            break
+        delay = scheduled_at - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        sent += 1
+        if len(tasks) >= max_in_flight:
+            # The generator itself is saturated; count it rather than queue unboundedly
+            results["errors"]["dropped"] += 1
+            continue
+
+        profile, body = rng.choices(bodies, weights=weights)[0]
+        task = asyncio.create_task(send(client, path, body(), scheduled_at, profile, results))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks)
+    elapsed = loop.time() - start
+
+    summary = summarize(results["latencies"], results["errors"], sent, elapsed)
+    summary["target_rps"] = rate
+    summary["profiles"] = {
+        profile: summarize(latencies, Counter(), len(latencies), elapsed)
+        for profile, latencies in sorted(results["by_profile"].items())
+    }
+    return summary
+
+
+def check_slo(step: dict, slo_p95_ms, slo_p99_ms, max_error_rate) -> list:
+    violations = []
+    if step["error_rate"] > max_error_rate:
+        violations.append(f"error rate {step['error_rate']:.2%} > {max_error_rate:.2%}")
+    if slo_p95_ms is not None and step.get("p95_ms", float("inf")) > slo_p95_ms:
+        violations.append(f"p95 {step.get('p95_ms')}ms > {slo_p95_ms}ms")
+    if slo_p99_ms is not None and step.get("p99_ms", float("inf")) > slo_p99_ms:
+        violations.append(f"p99 {step.get('p99_ms')}ms > {slo_p99_ms}ms")
+    return violations
+
+
+async def run(url, endpoint, rates, duration, connections, timeout, mix, n_results, cache_busting, seed,
+              max_in_flight, slo_p95_ms, slo_p99_ms, max_error_rate):
+    rng = random.Random(seed)
+    path = "/search/preferences" if endpoint == "preferences" else "/search"
+    weights = parse_mix(mix)
+
+    counter = iter(range(1, 1 << 62))
+    bodies = [
+        (name, lambda name=name: request_body(
+            endpoint, PROFILES[name], n_results, nonce=f"v{next(counter)}" if cache_busting else None
+        ))
+        for name in weights
+    ]
+
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=httpx.Timeout(timeout)) as client:
+        ready = await client.get("/ready")
+        if ready.status_code != 200:
+            raise click.ClickException(f"Bridge at {url} is not ready: {ready.status_code} {ready.text[:200]}")
+
+        steps = []
+        for rate in rates:
+            print(f"🚀 {rate:g} req/s for {duration:g}s over {connections} connections → {path}")
+            step = await run_step(client, path, rate, duration, bodies, list(weights.values()), rng, max_in_flight)
+            step["slo_violations"] = check_slo(step, slo_p95_ms, slo_p99_ms, max_error_rate)
+            steps.append(step)
+
+            print(
+                f"   {step['throughput_rps']:.1f} ok/s  sent {step['sent']}  errors {step['error_rate']:.2%} {step['errors'] or ''}"
+            )
+            if step["ok"]:
+                print(
+                    f"   p50 {step['p50_ms']}ms  p90 {step['p90_ms']}ms  p95 {step['p95_ms']}ms"
+                    f"  p99 {step['p99_ms']}ms  max {step['max_ms']}ms"
+                )
+            for violation in step["slo_violations"]:
+                print(f"   ❌ SLO: {violation}")
+        return steps
+
+
+@click.command()
+@click.option("--url", default=lambda: os.getenv("CHROMADB_API_URL", "http://localhost:8001"), help="Bridge base URL")
+@click.option("--endpoint", default="preferences", type=click.Choice(["preferences", "search"]),
+              help="preferences: structured /search/preferences (what the app sends); search: keyword string to /search")
+@click.option("--rate", "rates", type=float, multiple=True, default=[5.0],
+              help="Open-loop arrival rate in requests/s; repeat to step through several rates")
+@click.option("--duration", default=30.0, help="Seconds per rate step")
+@click.option("--connections", default=10, help="Maximum concurrent HTTP connections")
+@click.option("--timeout", default=10.0, help="Per-request timeout in seconds (including waiting for a connection)")
+@click.option("--mix", default=DEFAULT_MIX, help="Weighted profile mix, e.g. romantic_date=3,family=1")
+@click.option("--n-results", default=15, help="n_results per request (the app asks for 15)")
+@click.option("--cache-busting/--no-cache-busting", default=False,
+              help="Make every query unique so the bridge's caches cannot answer it")
+@click.option("--seed", default=42, help="Random seed for arrivals and profile choice")
+@click.option("--max-in-flight", default=1000, help="Outstanding requests before new arrivals are dropped")
+@click.option("--slo-p95-ms", type=float, default=None, help="Fail if p95 latency exceeds this")
+@click.option("--slo-p99-ms", type=float, default=None, help="Fail if p99 latency exceeds this")
+@click.option("--max-error-rate", default=0.01, help="Fail if more than this fraction of requests fail")
+@click.option("--output", default=None, help="Write the per-step results as JSON")
+def main(url, endpoint, rates, duration, connections, timeout, mix, n_results, cache_busting, seed,
+         max_in_flight, slo_p95_ms, slo_p99_ms, max_error_rate, output):
+    """Load test a running bridge with the test_chroma_api.py preference profiles."""
+    steps = asyncio.run(run(
+        url, endpoint, rates, duration, connections, timeout, mix, n_results, cache_busting, seed,
+        max_in_flight, slo_p95_ms, slo_p99_ms, max_error_rate
+    ))
+
+    if output:
+        with open(output, "w") as handle:
+            json.dump({
+                "url": url,
+                "endpoint": endpoint,
+                "connections": connections,
+                "mix": parse_mix(mix),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "steps": steps
+            }, handle, indent=2)
+        print(f"💾 Results written to {output}")
+
+    failed = [step["target_rps"] for step in steps if step["slo_violations"]]
+    if failed:
+        raise click.ClickException(f"SLO violated at {', '.join(f'{rate:g} req/s' for rate in failed)}")
+    print("✅ All steps within SLO")
+
+
+if __name__ == "__main__":
+    main()
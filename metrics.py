@@ -0,0 +1,109 @@
+"""
+Prometheus-style request and search stage metrics for the ChromaDB bridge
+
+Histograms keep cumulative bucket counts per label and render themselves
+in the Prometheus text exposition format for /metrics. Nothing here
+touches ChromaDB, the embedding backend or the web framework.
+"""
+
+from contextlib import contextmanager
+from typing import List
+import threading
+import time
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def format_labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    pairs = []
+    for name, value in labels.items():
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram keyed by one label, in Prometheus layout"""
+
+    def __init__(self, name: str, help_text: str, label_name: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.label_name = label_name
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label: str, seconds: float):
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = {"counts": [0] * len(self.buckets), "sum": 0.0, "count": 0}
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series["counts"][i] += 1
+            series["sum"] += seconds
+            series["count"] += 1
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for label, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series["counts"]):
+                    labels = format_labels({self.label_name: label, "le": bound})
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = format_labels({self.label_name: label, "le": "+Inf"})
+                lines.append(f"{self.name}_bucket{labels} {series['count']}")
+                labels = format_labels({self.label_name: label})
+                lines.append(f"{self.name}_sum{labels} {series['sum']}")
+                lines.append(f"{self.name}_count{labels} {series['count']}")
+        return lines
+
+
+class Metrics:
+    """Process-wide request and per-stage latency metrics for /metrics"""
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            "chromadb_bridge_stage_seconds",
+            "Time spent in each search stage.",
+            "stage"
+        )
+        self.request_seconds = Histogram(
+            "chromadb_bridge_request_seconds",
+            "End-to-end HTTP request latency.",
+            "path"
+        )
+        self.requests = {}
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(name, time.perf_counter() - start)
+
+    def record_request(self, path: str, status: int, seconds: float):
+        self.request_seconds.observe(path, seconds)
+        with self._lock:
+            key = (path, status)
+            self.requests[key] = self.requests.get(key, 0) + 1
+
+    def render_requests(self) -> List[str]:
+        lines = [
+            "# HELP chromadb_bridge_requests_total HTTP requests by path and status.",
+            "# TYPE chromadb_bridge_requests_total counter"
+        ]
+        with self._lock:
+            for (path, status), count in sorted(self.requests.items()):
+                lines.append(f"chromadb_bridge_requests_total{format_labels({'path': path, 'status': status})} {count}")
+            lines += [
+                "# HELP chromadb_bridge_in_flight_requests HTTP requests currently being served.",
+                "# TYPE chromadb_bridge_in_flight_requests gauge",
+                f"chromadb_bridge_in_flight_requests {self.in_flight}"
+            ]
+        return lines
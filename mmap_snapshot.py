@@ -0,0 +1,449 @@
+"""
+Read-only, memory-mapped collection snapshots for the ChromaDB bridge
+
+A snapshot directory holds the collection's embedding matrix as a float32
+.npy file plus two variable-length record files (flat metadata and
+pre-encoded activity JSON) sliced by offset arrays. Format 2 adds what the
+bridge would otherwise derive from full_data in every worker: BM25
+postings, collapse groups and coordinates. Every file is opened with mmap,
+so any number of worker processes serving the same snapshot share one copy
+of the data in the OS page cache instead of each holding its own
+PersistentClient and index.
+
+SnapshotCollection answers the subset of the chromadb Collection API the
+bridge uses (count, get, query) with exact NumPy search.
+"""
+
+from collections import OrderedDict
+from typing import List, Optional
+import json
+import mmap
+import os
+import shutil
+import threading
+import time
+import uuid
+
+import numpy as np
+import orjson
+
+SNAPSHOT_FORMAT = 2
+# Format 1 snapshots lack the serving arrays; the bridge parses full_data for them
+READABLE_FORMATS = (1, 2)
+MANIFEST_FILE = "manifest.json"
+IDS_FILE = "ids.json"
+EMBEDDINGS_FILE = "embeddings.npy"
+METADATA_FILE = "metadata.bin"
+METADATA_OFFSETS_FILE = "metadata_offsets.npy"
+FRAGMENTS_FILE = "fragments.bin"
+FRAGMENT_OFFSETS_FILE = "fragment_offsets.npy"
+LEXICAL_VOCABULARY_FILE = "lexical_vocabulary.json"
+LEXICAL_OFFSETS_FILE = "lexical_offsets.npy"
+LEXICAL_DOCS_FILE = "lexical_docs.npy"
+LEXICAL_COUNTS_FILE = "lexical_counts.npy"
+LEXICAL_LENGTHS_FILE = "lexical_lengths.npy"
+COLLAPSE_GROUPS_FILE = "collapse_groups.npy"
+COORDINATES_FILE = "coordinates.npy"
+
+
+def lexical_postings(token_lists: List[List[str]]):
+    """
+    Inverted index over tokenized documents as flat arrays
+
+    Returns (vocabulary, offsets, docs, counts, lengths): the postings of
+    vocabulary[i] are docs[offsets[i]:offsets[i + 1]] with their term
+    counts, and lengths holds each document's token count.
+    """
+    postings = {}
+    lengths = np.zeros(len(token_lists), dtype=np.int32)
+    for doc, tokens in enumerate(token_lists):
+        lengths[doc] = len(tokens)
+        counts = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        for token, count in counts.items():
+            postings.setdefault(token, []).append((doc, count))
+
+    vocabulary = sorted(postings)
+    offsets = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+    for i, token in enumerate(vocabulary):
+        offsets[i + 1] = offsets[i] + len(postings[token])
+    docs = np.fromiter((doc for token in vocabulary for doc, _ in postings[token]), dtype=np.int32, count=int(offsets[-1]))
+    counts = np.fromiter((count for token in vocabulary for _, count in postings[token]), dtype=np.int32, count=int(offsets[-1]))
+    return vocabulary, offsets, docs, counts, lengths
+
+
+def write_records(directory: str, data_file: str, offsets_file: str, records: List[bytes]):
+    offsets = np.zeros(len(records) + 1, dtype=np.int64)
+    with open(os.path.join(directory, data_file), "wb") as handle:
+        for i, record in enumerate(records):
+            handle.write(record)
+            offsets[i + 1] = offsets[i] + len(record)
+    np.save(os.path.join(directory, offsets_file), offsets)
+
+
+def write_snapshot(directory: str, ids: List[str], embeddings: np.ndarray, metadatas: List[dict],
+                   fragments: List[bytes], space: str, info: Optional[dict] = None,
+                   lexical_tokens: Optional[List[List[str]]] = None, collapse_keys: Optional[List[str]] = None,
+                   coordinates: Optional[np.ndarray] = None) -> dict:
+    """
+    Write a snapshot and move it into place at directory
+
+    Files are written to a staging directory first, so workers never see a
+    half-written snapshot. Workers that already mapped the old files keep
+    reading them until they reopen the snapshot. lexical_tokens,
+    collapse_keys and coordinates (latitude, longitude; NaN when unknown)
+    are one entry per id and are stored as shared arrays.
+    """
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    if embeddings.ndim != 2 or len(embeddings) != len(ids):
+        raise ValueError("embeddings must be one row per id")
+    if not len(ids) == len(metadatas) == len(fragments):
+        raise ValueError("ids, metadatas and fragments must have the same length")
+    for name, values in (("lexical_tokens", lexical_tokens), ("collapse_keys", collapse_keys), ("coordinates", coordinates)):
+        if values is not None and len(values) != len(ids):
+            raise ValueError(f"{name} must have one entry per id")
+
+    directory = os.path.abspath(directory)
+    staging = f"{directory}.tmp-{os.getpid()}"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    np.save(os.path.join(staging, EMBEDDINGS_FILE), embeddings)
+    with open(os.path.join(staging, IDS_FILE), "wb") as handle:
+        handle.write(orjson.dumps(list(ids)))
+    write_records(staging, METADATA_FILE, METADATA_OFFSETS_FILE, [orjson.dumps(metadata) for metadata in metadatas])
+    write_records(staging, FRAGMENTS_FILE, FRAGMENT_OFFSETS_FILE, list(fragments))
+
+    vocabulary, offsets, docs, counts, lengths = lexical_postings(lexical_tokens or [[] for _ in ids])
+    with open(os.path.join(staging, LEXICAL_VOCABULARY_FILE), "wb") as handle:
+        handle.write(orjson.dumps(vocabulary))
+    np.save(os.path.join(staging, LEXICAL_OFFSETS_FILE), offsets)
+    np.save(os.path.join(staging, LEXICAL_DOCS_FILE), docs)
+    np.save(os.path.join(staging, LEXICAL_COUNTS_FILE), counts)
+    np.save(os.path.join(staging, LEXICAL_LENGTHS_FILE), lengths)
+
+    # Collapse keys become small group numbers, equal when the keys are
+    groups = {}
+    keys = collapse_keys or [f"id:{activity_id}" for activity_id in ids]
+    np.save(os.path.join(staging, COLLAPSE_GROUPS_FILE),
+            np.asarray([groups.setdefault(key, len(groups)) for key in keys], dtype=np.int32))
+
+    if coordinates is None:
+        coordinates = np.full((len(ids), 2), np.nan)
+    np.save(os.path.join(staging, COORDINATES_FILE), np.asarray(coordinates, dtype=np.float64).reshape(len(ids), 2))
+
+    manifest = {
+        **(info or {}),
+        "format": SNAPSHOT_FORMAT,
+        "count": len(ids),
+        "dimensions": int(embeddings.shape[1]),
+        "space": space,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        # Lets serving bridges tell two exports apart within the same second
+        "snapshot_id": uuid.uuid4().hex
+    }
+    with open(os.path.join(staging, MANIFEST_FILE), "w") as handle:
+        json.dump(manifest, handle, indent=2)
+
+    previous = f"{directory}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, previous)
+    os.replace(staging, directory)
+    shutil.rmtree(previous, ignore_errors=True)
+    return manifest
+
+
+class MappedRecords:
+    """Variable-length byte records in one memory-mapped file, sliced by an offsets array"""
+
+    def __init__(self, data_path: str, offsets_path: str):
+        self.offsets = np.load(offsets_path, mmap_mode="r")
+        with open(data_path, "rb") as handle:
+            # mmap refuses empty files, and an empty collection has nothing to slice
+            self._data = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(handle.fileno()).st_size else b""
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> bytes:
+        return self._data[int(self.offsets[row]):int(self.offsets[row + 1])]
+
+
+class MappedCollapseGroups:
+    """Read-only id -> collapse group number mapping backed by a snapshot"""
+
+    def __init__(self, rows: dict, groups: np.ndarray):
+        self._rows = rows
+        self._groups = groups
+
+    def get(self, activity_id: str, default=None):
+        row = self._rows.get(activity_id)
+        return default if row is None else int(self._groups[row])
+
+
+class MappedFragments:
+    """Read-only id -> encoded activity JSON mapping backed by a snapshot"""
+
+    def __init__(self, rows: dict, records: MappedRecords):
+        self._rows = rows
+        self._records = records
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __contains__(self, activity_id) -> bool:
+        return activity_id in self._rows
+
+    def __getitem__(self, activity_id: str) -> bytes:
+        return self._records[self._rows[activity_id]]
+
+    def get(self, activity_id: str, default=None):
+        row = self._rows.get(activity_id)
+        return default if row is None else self._records[row]
+
+
+def matches_where(metadata: dict, where: dict) -> bool:
+    """Evaluate a Chroma where clause against one record's metadata"""
+    for key, condition in where.items():
+        if key == "$and":
+            if not all(matches_where(metadata, clause) for clause in condition):
+                return False
+        elif key == "$or":
+            if not any(matches_where(metadata, clause) for clause in condition):
+                return False
+        else:
+            if key not in metadata:
+                return False
+            value = metadata[key]
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            for operator, operand in condition.items():
+                if operator == "$eq":
+                    matched = value == operand
+                elif operator == "$ne":
+                    matched = value != operand
+                elif operator == "$gt":
+                    matched = value > operand
+                elif operator == "$gte":
+                    matched = value >= operand
+                elif operator == "$lt":
+                    matched = value < operand
+                elif operator == "$lte":
+                    matched = value <= operand
+                elif operator == "$in":
+                    matched = value in operand
+                elif operator == "$nin":
+                    matched = value not in operand
+                else:
+                    raise ValueError(f"Unsupported where operator: {operator}")
+                if not matched:
+                    return False
+    return True
+
+
+def space_distances(queries: np.ndarray, matrix: np.ndarray, squared_norms: np.ndarray, space: str) -> np.ndarray:
+    """Distances from each query row to each matrix row in a Chroma/hnswlib space"""
+    products = queries @ matrix.T
+    if space == "ip":
+        return 1.0 - products
+    if space == "cosine":
+        query_norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        denominator = np.maximum(query_norms * np.sqrt(squared_norms)[None, :], 1e-12)
+        return 1.0 - products / denominator
+    # Squared L2, matching hnswlib's l2 space
+    query_norms = np.einsum("ij,ij->i", queries, queries)
+    return np.maximum(query_norms[:, None] + squared_norms[None, :] - 2.0 * products, 0.0)
+
+
+class WhereRows:
+    """
+    Row indices matching where clauses over per-row flat metadata
+
+    Results for recent clauses are cached, since filter combinations repeat
+    far more often than queries do.
+    """
+
+    def __init__(self, metadatas: List[dict], cache_size: int = 256):
+        self.metadatas = metadatas
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._removed = None
+        self._lock = threading.Lock()
+
+    def remove(self, rows: List[int]):
+        """Leave rows out of every later live selection"""
+        removed = np.zeros(len(self.metadatas), dtype=bool) if self._removed is None else self._removed.copy()
+        removed[np.asarray(rows, dtype=np.int64)] = True
+        # Replaced, not updated in place, so concurrent selections see one version
+        self._removed = removed
+
+    def matching(self, where: dict) -> np.ndarray:
+        key = json.dumps(where, sort_keys=True)
+        with self._lock:
+            rows = self._cache.get(key)
+            if rows is not None:
+                self._cache.move_to_end(key)
+                return rows
+
+        rows = np.fromiter(
+            (row for row, metadata in enumerate(self.metadatas) if matches_where(metadata, where)),
+            dtype=np.int64
+        )
+        with self._lock:
+            self._cache[key] = rows
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return rows
+
+    def select(self, row_ids: dict, ids: Optional[List[str]], where: Optional[dict],
+               live: bool = False) -> Optional[np.ndarray]:
+        """Row indices allowed by ids and where (and not removed, if live), or None for every row"""
+        rows = None
+        if ids is not None:
+            rows = np.fromiter((row_ids[activity_id] for activity_id in ids if activity_id in row_ids), dtype=np.int64)
+        if where:
+            matching = self.matching(where)
+            rows = matching if rows is None else rows[np.isin(rows, matching)]
+        removed = self._removed
+        if live and removed is not None:
+            rows = np.flatnonzero(~removed) if rows is None else rows[~removed[rows]]
+        return rows
+
+
+class SnapshotCollection:
+    """
+    Read-only stand-in for a chromadb Collection served from a snapshot
+
+    The embedding matrix stays memory-mapped; only ids, per-row norms and
+    the flat filter metadata (full_data excluded) are held per process.
+    Format 2 snapshots also expose lexical (the lexical_postings arrays),
+    collapse_groups and coordinates, all memory-mapped; they are None for
+    format 1.
+    """
+
+    def __init__(self, directory: str, where_cache_size: int = 256):
+        self.directory = directory
+        with open(os.path.join(directory, MANIFEST_FILE)) as handle:
+            self.manifest = json.load(handle)
+        if self.manifest.get("format") not in READABLE_FORMATS:
+            raise ValueError(f"Unsupported snapshot format: {self.manifest.get('format')}")
+
+        self.name = self.manifest.get("collection", os.path.basename(os.path.normpath(directory)))
+        self.space = self.manifest.get("space", "l2")
+        with open(os.path.join(directory, IDS_FILE), "rb") as handle:
+            self.ids = orjson.loads(handle.read())
+        self._rows = {activity_id: row for row, activity_id in enumerate(self.ids)}
+
+        self.embeddings = np.load(os.path.join(directory, EMBEDDINGS_FILE), mmap_mode="r")
+        self._squared_norms = np.einsum("ij,ij->i", self.embeddings, self.embeddings)
+
+        self._metadata = MappedRecords(
+            os.path.join(directory, METADATA_FILE), os.path.join(directory, METADATA_OFFSETS_FILE)
+        )
+        filter_fields = []
+        for row in range(len(self._metadata)):
+            metadata = orjson.loads(self._metadata[row])
+            metadata.pop("full_data", None)
+            filter_fields.append(metadata)
+        self.filter_fields = filter_fields
+        self._where_rows = WhereRows(filter_fields, where_cache_size)
+
+        self.fragments = MappedFragments(self._rows, MappedRecords(
+            os.path.join(directory, FRAGMENTS_FILE), os.path.join(directory, FRAGMENT_OFFSETS_FILE)
+        ))
+
+        self.lexical = None
+        self.collapse_groups = None
+        self.coordinates = None
+        if self.manifest["format"] >= 2:
+            with open(os.path.join(directory, LEXICAL_VOCABULARY_FILE), "rb") as handle:
+                vocabulary = orjson.loads(handle.read())
+            self.lexical = (vocabulary, *(
+                np.load(os.path.join(directory, name), mmap_mode="r")
+                for name in (LEXICAL_OFFSETS_FILE, LEXICAL_DOCS_FILE, LEXICAL_COUNTS_FILE, LEXICAL_LENGTHS_FILE)
+            ))
+            self.collapse_groups = MappedCollapseGroups(
+                self._rows, np.load(os.path.join(directory, COLLAPSE_GROUPS_FILE), mmap_mode="r")
+            )
+            self.coordinates = np.load(os.path.join(directory, COORDINATES_FILE), mmap_mode="r")
+
+    @property
+    def rows(self) -> dict:
+        """id -> row number"""
+        return self._rows
+
+    @property
+    def configuration(self) -> dict:
+        return {"hnsw": {"space": self.space}}
+
+    @property
+    def metadata(self) -> dict:
+        return self.manifest
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def update(self, **kwargs):
+        raise ValueError("Snapshot collections are read-only")
+
+    def remove(self, ids: List[str]):
+        """Leave ids out of query results from now on; get still returns them"""
+        self._where_rows.remove([self._rows[activity_id] for activity_id in ids if activity_id in self._rows])
+
+    def _select_rows(self, ids: Optional[List[str]], where: Optional[dict], live: bool = False) -> Optional[np.ndarray]:
+        return self._where_rows.select(self._rows, ids, where, live)
+
+    def _distances(self, queries: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        if rows is None:
+            return space_distances(queries, self.embeddings, self._squared_norms, self.space)
+        return space_distances(queries, self.embeddings[rows], self._squared_norms[rows], self.space)
+
+    def _rows_result(self, rows: List[int], include: List[str]) -> dict:
+        result = {"ids": [self.ids[row] for row in rows]}
+        if "embeddings" in include:
+            result["embeddings"] = np.asarray(self.embeddings[rows]) if rows else np.zeros((0, self.embeddings.shape[1]), dtype=np.float32)
+        if "metadatas" in include:
+            result["metadatas"] = [orjson.loads(self._metadata[row]) for row in rows]
+        return result
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[dict] = None, limit: Optional[int] = None,
+            offset: Optional[int] = None, include: Optional[List[str]] = None) -> dict:
+        include = ["metadatas"] if include is None else include
+        rows = self._select_rows(ids, where)
+        rows = list(range(len(self.ids))) if rows is None else rows.tolist()
+        start = offset or 0
+        rows = rows[start:start + limit] if limit is not None else rows[start:]
+        return self._rows_result(rows, include)
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[dict] = None,
+              ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> dict:
+        include = ["distances"] if include is None else include
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.embeddings.shape[1])
+        rows = self._select_rows(ids, where, live=True)
+        candidates = len(self.ids) if rows is None else len(rows)
+
+        results = {"ids": [], "distances": [], "embeddings": [], "metadatas": []}
+        k = min(n_results, candidates)
+        if k <= 0:
+            for _ in range(len(queries)):
+                for field in results:
+                    results[field].append([])
+            return {field: values for field, values in results.items() if field == "ids" or field in include}
+
+        distances = self._distances(queries, rows)
+        for query_distances in distances:
+            if k < candidates:
+                top = np.argpartition(query_distances, k - 1)[:k]
+            else:
+                top = np.arange(candidates)
+            top = top[np.argsort(query_distances[top], kind="stable")]
+            hit_rows = top.tolist() if rows is None else rows[top].tolist()
+
+            hits = self._rows_result(hit_rows, include)
+            results["ids"].append(hits["ids"])
+            results["distances"].append(query_distances[top].tolist())
+            results["embeddings"].append(hits.get("embeddings"))
+            results["metadatas"].append(hits.get("metadatas"))
+
+        return {field: values for field, values in results.items() if field == "ids" or field in include}
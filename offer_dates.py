@@ -0,0 +1,75 @@
+"""
+Offer validity dates shared by the ChromaDB bridge and its admin CLI
+
+Dates are compared as sortable YYYYMMDD integers. An offer is served
+through its validity_end date in EXPIRY_TIMEZONE and has expired from the
+next day on. ExpiryIndex orders activities by that date so the bridge
+finds what has expired by bisection. Nothing here touches ChromaDB or an
+embedding backend.
+"""
+
+from datetime import date, datetime
+from typing import List, Optional
+import bisect
+import os
+from zoneinfo import ZoneInfo
+
+# Stored for offers without a validity_end, since Chroma metadata cannot hold nulls
+NO_EXPIRY_ORDINAL = 99991231
+
+
+def date_ordinal(value) -> Optional[int]:
+    """Encode a date or ISO date string as a sortable YYYYMMDD integer"""
+    if isinstance(value, str):
+        try:
+            value = date.fromisoformat(value[:10])
+        except ValueError:
+            return None
+    if isinstance(value, date):
+        return value.year * 10000 + value.month * 100 + value.day
+    return None
+
+
+def configured_timezone() -> ZoneInfo:
+    """EXPIRY_TIMEZONE, read when called so .env files loaded after import still apply"""
+    return ZoneInfo(os.getenv("EXPIRY_TIMEZONE", "Asia/Singapore"))
+
+
+def today_ordinal(timezone: ZoneInfo) -> int:
+    """Today's date ordinal in timezone; offers whose validity_end is earlier have expired"""
+    return date_ordinal(datetime.now(timezone).date())
+
+
+class ExpiryIndex:
+    """
+    Activity ids ordered by validity_end
+
+    Everything that expired before a date is a prefix of the order, found by
+    bisection, so a sweep costs as much as what expired, not the catalogue.
+    Activities without a validity_end are not indexed.
+    """
+
+    def __init__(self):
+        self._ordinals = []
+        self._ids = []
+
+    def __len__(self):
+        return len(self._ids)
+
+    def build(self, expiries: dict):
+        """Index an id -> validity_end ordinal mapping, skipping ids without one"""
+        entries = sorted((ordinal, activity_id) for activity_id, ordinal in expiries.items() if ordinal is not None)
+        self._ordinals = [ordinal for ordinal, _ in entries]
+        self._ids = [activity_id for _, activity_id in entries]
+        return self
+
+    def pop_expired(self, cutoff: int) -> List[str]:
+        """Remove and return the ids whose validity_end is before cutoff"""
+        end = bisect.bisect_left(self._ordinals, cutoff)
+        expired = self._ids[:end]
+        del self._ordinals[:end]
+        del self._ids[:end]
+        return expired
+
+    def next_expiry(self) -> Optional[int]:
+        return self._ordinals[0] if self._ordinals else None
@@ -0,0 +1,58 @@
+"""
+Result re-ranking for the ChromaDB bridge
+
+Reciprocal-rank fusion merges vector and keyword rankings for hybrid
+search, and Maximal Marginal Relevance trades relevance for diversity
+within a candidate pool.
+"""
+
+from typing import List
+
+import numpy as np
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int) -> List[str]:
+    """Fuse ranked id lists by summing 1 / (k + rank) across lists"""
+    scores = {}
+    for ranking in rankings:
+        for rank, activity_id in enumerate(ranking, start=1):
+            scores[activity_id] = scores.get(activity_id, 0.0) + 1.0 / (k + rank)
+    return sorted(scores, key=scores.get, reverse=True)
+
+
+def unit_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_select(relevance: np.ndarray, embeddings: np.ndarray, k: int, diversity: float) -> List[int]:
+    """
+    Maximal Marginal Relevance over candidate rows
+
+    Greedily picks the candidate maximising
+    (1 - diversity) * relevance - diversity * max similarity to picks so far.
+    Returns candidate indices in pick order.
+    """
+    count = len(relevance)
+    if count == 0 or k <= 0:
+        return []
+
+    vectors = unit_rows(np.asarray(embeddings, dtype=np.float32))
+    similarity = vectors @ vectors.T
+    weight = min(max(diversity, 0.0), 1.0)
+
+    selected = [int(np.argmax(relevance))]
+    max_similarity = similarity[selected[0]].copy()
+    available = np.ones(count, dtype=bool)
+    available[selected[0]] = False
+
+    while len(selected) < min(k, count):
+        scores = (1 - weight) * relevance - weight * max_similarity
+        scores[~available] = -np.inf
+        pick = int(np.argmax(scores))
+        selected.append(pick)
+        available[pick] = False
+        np.maximum(max_similarity, similarity[pick], out=max_similarity)
+
+    return selected
@@ -0,0 +1,259 @@
+"""
+Request serving machinery for the ChromaDB bridge
+
+Bounded search execution off the event loop, coalescing of identical
+in-flight searches, startup readiness and blue/green store swaps. These
+classes know nothing about ChromaDB or the activity store; the bridge
+passes in the work to run and the callables that load and promote a store.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+import asyncio
+import threading
+import time
+
+from fastapi import HTTPException
+
+from metrics import Metrics
+
+
+class SearchExecutor:
+    """
+    Runs blocking search work on a dedicated thread pool
+
+    At most max_concurrency searches execute at once and at most max_queue
+    wait behind them; anything beyond that is shed with a 503 so a slow
+    embedding call can never stall the event loop or pile up unbounded work.
+    """
+
+    def __init__(self, max_concurrency: int, max_queue: int, retry_after_seconds: int, metrics: Optional[Metrics] = None):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.retry_after_seconds = retry_after_seconds
+        self.metrics = metrics
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_concurrency,
+            thread_name_prefix="search"
+        )
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.queue_wait_seconds = 0.0
+        self.max_queue_wait_seconds = 0.0
+        self.execution_seconds = 0.0
+        self.max_execution_seconds = 0.0
+
+    async def run(self, fn, *args):
+        """Run fn(*args) on the search pool, raising 503 when the queue is full"""
+        # pending is only touched from the event loop thread
+        if self.pending >= self.max_concurrency + self.max_queue:
+            with self._lock:
+                self.rejected += 1
+            raise HTTPException(
+                status_code=503,
+                detail="Search is at capacity, retry shortly",
+                headers={"Retry-After": str(self.retry_after_seconds)}
+            )
+
+        self.pending += 1
+        enqueued_at = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, self._timed, enqueued_at, fn, args)
+        finally:
+            self.pending -= 1
+
+    def _timed(self, enqueued_at: float, fn, args):
+        started_at = time.perf_counter()
+        queue_wait = started_at - enqueued_at
+        if self.metrics is not None:
+            self.metrics.stage_seconds.observe("queue_wait", queue_wait)
+        with self._lock:
+            self.running += 1
+            self.queue_wait_seconds += queue_wait
+            self.max_queue_wait_seconds = max(self.max_queue_wait_seconds, queue_wait)
+
+        failed = False
+        try:
+            return fn(*args)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            execution = time.perf_counter() - started_at
+            with self._lock:
+                self.running -= 1
+                self.execution_seconds += execution
+                self.max_execution_seconds = max(self.max_execution_seconds, execution)
+                if failed:
+                    self.failed += 1
+                else:
+                    self.completed += 1
+
+    def stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "running": self.running,
+                "queued": max(self.pending - self.running, 0),
+                "completed": self.completed,
+                "failed": self.failed,
+                "rejected": self.rejected,
+                "avg_queue_wait_ms": round(self.queue_wait_seconds / finished * 1000, 2) if finished else 0.0,
+                "max_queue_wait_ms": round(self.max_queue_wait_seconds * 1000, 2),
+                "avg_execution_ms": round(self.execution_seconds / finished * 1000, 2) if finished else 0.0,
+                "max_execution_ms": round(self.max_execution_seconds * 1000, 2)
+            }
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical searches onto one in-flight task
+
+    The first caller for a key starts the work and later callers await the
+    same task, so a burst of identical requests costs one embedding call
+    and one collection query. The task is shielded, so a caller that
+    disconnects does not cancel the search for everyone else. Only touched
+    from the event loop thread.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self.started = {}
+        self.coalesced = {}
+
+    async def run(self, endpoint: str, key: str, fn, *args):
+        task = self._calls.get((endpoint, key))
+        if task is not None:
+            self.coalesced[endpoint] = self.coalesced.get(endpoint, 0) + 1
+            return await asyncio.shield(task)
+
+        task = asyncio.ensure_future(fn(*args))
+        self._calls[(endpoint, key)] = task
+        task.add_done_callback(lambda _: self._calls.pop((endpoint, key), None))
+        self.started[endpoint] = self.started.get(endpoint, 0) + 1
+        return await asyncio.shield(task)
+
+    def stats(self):
+        return {
+            "in_flight": len(self._calls),
+            "started": dict(self.started),
+            "coalesced": dict(self.coalesced)
+        }
+
+
+class Readiness:
+    """Progress of the background startup, reported by /health and /ready"""
+
+    def __init__(self):
+        self.phase = "starting"
+        self.ready = False
+        self.error = None
+        self.started_at = time.monotonic()
+        self.timings_ms = {}
+
+    def advance(self, phase: str):
+        self.phase = phase
+        print(f"🚦 Startup phase: {phase}")
+
+    def record(self, step: str, started_at: float):
+        self.timings_ms[step] = round((time.perf_counter() - started_at) * 1000, 1)
+
+    def as_dict(self):
+        return {
+            "phase": self.phase,
+            "ready": self.ready,
+            "error": self.error,
+            "uptime_seconds": round(time.monotonic() - self.started_at, 1),
+            "timings_ms": self.timings_ms
+        }
+
+
+class StoreSwapper:
+    """
+    Swaps a newly published snapshot or collection in without a restart
+
+    A watcher thread polls published_version(). A new version is handed to
+    load_version(record), which opens, loads and warms a fresh store while
+    the current one keeps serving, and the result is passed to promote().
+    Promotion only rebinds the serving store reference, so in-flight
+    searches finish on the store they started with and the old one is freed
+    after them. Both stores are in memory during the swap. A version that
+    fails to load is not retried until another is published.
+    """
+
+    def __init__(self, check_seconds: float, published_version: Callable[[], Optional[str]],
+                 load_version: Callable, promote: Callable):
+        self.check_seconds = check_seconds
+        self.published_version = published_version
+        self.load_version = load_version
+        self.promote = promote
+        self.version = None
+        self.failed_version = None
+        self.swaps = 0
+        self.failures = 0
+        self.last_error = None
+        self.last_swap_at = None
+        self.timings_ms = {}
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def record(self, step: str, started_at: float):
+        self.timings_ms[step] = round((time.perf_counter() - started_at) * 1000, 1)
+
+    def check(self) -> bool:
+        """Load, warm and promote the published version if it is new (blocking)"""
+        with self._lock:
+            version = self.published_version()
+            if version is None or version in (self.version, self.failed_version):
+                return False
+
+            print("🔁 New version published, loading it next to the serving store")
+            self.timings_ms = {}
+            try:
+                store = self.load_version(self.record)
+            except Exception as e:
+                self.failed_version = version
+                self.failures += 1
+                self.last_error = str(e)
+                print(f"❌ Hot swap failed, still serving the previous version: {e}")
+                return False
+
+            self.promote(store)
+            self.version = version
+            self.swaps += 1
+            self.last_error = None
+            self.last_swap_at = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+            print(f"✅ Now serving '{store.collection.name}' ({len(store)} activities)")
+            return True
+
+    def _watch(self):
+        while True:
+            time.sleep(self.check_seconds)
+            try:
+                self.check()
+            except Exception as e:
+                print(f"⚠️ Hot swap check failed: {e}")
+
+    def start(self):
+        if self.check_seconds <= 0 or self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._watch, name="store-swapper", daemon=True)
+        self._thread.start()
+
+    def stats(self):
+        return {
+            "enabled": self.check_seconds > 0,
+            "check_seconds": self.check_seconds,
+            "swaps": self.swaps,
+            "failures": self.failures,
+            "last_swap_at": self.last_swap_at,
+            "last_error": self.last_error,
+            "timings_ms": self.timings_ms
+        }
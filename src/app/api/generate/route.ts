@@ -1,8 +1,7 @@
 import { NextRequest, NextResponse } from 'next/server'
 import { createServerSupabaseClient } from '@/lib/supabase-server'
 import Exa from "exa-js"
-import { buildSemanticKeywords } from './utils/keywords'
-import { queryActivities } from './utils/chromaClient'
+import { queryActivitiesByPreferences, PreferenceSearch } from './utils/chromaClient'
 import { selectAndArrangeActivities, enhanceItinerary } from './utils/llmCurator'
 
 // Helper: Detect if query is venue-specific (e.g., "brunch spots", "cafes", "bars")
@@ -26,42 +25,37 @@ export async function POST(request: NextRequest) {
     // Log the search parameters for debugging
     console.log('🔍 Search parameters received:', body)
 
-    // STEP 1: Build semantic keywords for ChromaDB search
-    const semanticQuery = buildSemanticKeywords({
-      query: body.query,
+    // STEP 1: Collect preferences for ChromaDB search. The bridge embeds the
+    // budget / group / MBTI / spicy keyword sets once and only embeds the
+    // free-text query and activity names per request
+    const preferences: PreferenceSearch = {
+      query: body.query || '',
       activities: body.activities,
       budget: body.budget,
       numPax: body.numPax,
       mbti: body.mbti,
       spicy: body.spicy
-    })
-    console.log('📝 Semantic query:', semanticQuery)
+    }
+    console.log('📝 Preferences:', preferences)
 
-    // STEP 2: Fetch activities from ChromaDB with multi-query strategy
+    // STEP 2: Fetch activities from ChromaDB
     const chromaStartTime = Date.now()
     let chromaActivities: any[] = []
     try {
       const isVenueQuery = isVenueSpecificQuery(body.query)
 
       if (isVenueQuery) {
-        // Multi-query strategy: Get specific venues + diverse activities
-        console.log('🎯 Venue-specific query detected - using dual query strategy')
-
-        // Query 1: Get 3-5 of the requested venue type
-        const specificActivities = await queryActivities(semanticQuery, 5)
-        console.log(`✅ ChromaDB (specific): Found ${specificActivities.length} matching venues`)
-
-        // Query 2: Get 10 diverse complementary activities
-        const diverseQuery = `${body.query} things to do activities attractions experiences Singapore`
-        const diverseActivities = await queryActivities(diverseQuery, 10)
-        console.log(`✅ ChromaDB (diverse): Found ${diverseActivities.length} complementary activities`)
+        // Diversity strategy: one query, MMR re-ranked on the bridge so the
+        // top venue matches come first and near-duplicates make way for
+        // complementary activities
+        console.log('🎯 Venue-specific query detected - using diversity re-ranking')
 
-        // Merge results (specific first, then diverse)
-        chromaActivities = [...specificActivities, ...diverseActivities]
-        console.log(`📊 ChromaDB: Combined ${chromaActivities.length} total activities (${specificActivities.length} specific + ${diverseActivities.length} diverse)`)
+        chromaActivities = await queryActivitiesByPreferences(preferences, 15, undefined, 0.3)
+        console.log(`✅ ChromaDB (diverse): Found ${chromaActivities.length} activities`)
       } else {
-        // Standard single query for full-day plans
-        chromaActivities = await queryActivities(semanticQuery, 15)
+        // Standard single query for full-day plans, one hit per venue so
+        // reposts of the same place do not crowd out the rest of the day
+        chromaActivities = await queryActivitiesByPreferences(preferences, 15, undefined, undefined, true)
         console.log(`✅ ChromaDB: Found ${chromaActivities.length} activities`)
       }
     } catch (error) {
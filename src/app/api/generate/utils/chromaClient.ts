@@ -15,18 +15,38 @@ export interface Activity {
   source_link?: string | null
   latitude?: number | null
   longitude?: number | null
+  id?: string | null // collection id, for findSimilarActivities
   coordinates?: {
     lat: number
     lng: number
   }
 }
 
+// Metadata filters applied inside the vector search
+export interface SearchFilters {
+  min_price?: number
+  max_price?: number
+  include_unknown_price?: boolean
+  offer_type?: string[]
+  tags_any?: string[]
+  tags_all?: string[]
+  source_type?: string[]
+  valid_on?: string // YYYY-MM-DD
+}
+
 // Use environment variable for API URL, fallback to localhost for development
 const CHROMADB_API_URL = process.env.CHROMADB_API_URL || 'http://localhost:8001'
 
+// vector: embeddings only, keyword: BM25 only, hybrid: both fused with RRF
+export type SearchMode = 'vector' | 'hybrid' | 'keyword'
+
 export async function queryActivities(
   semanticQuery: string,
-  topK: number = 20
+  topK: number = 20,
+  filters?: SearchFilters,
+  mode: SearchMode = 'vector',
+  diversity?: number, // 0-1, MMR re-ranking on the bridge
+  collapse: boolean = false // best hit per venue, reposts and cross-posts dropped
 ): Promise<Activity[]> {
   try {
     console.log(`🔍 Querying ChromaDB API: "${semanticQuery}" (top ${topK})`)
@@ -39,7 +59,11 @@ export async function queryActivities(
       },
       body: JSON.stringify({
         query: semanticQuery,
-        n_results: topK
+        n_results: topK,
+        filters,
+        mode,
+        diversity,
+        collapse
       })
     })
 
@@ -59,3 +83,134 @@ export async function queryActivities(
     throw new Error('Failed to query activities database')
   }
 }
+
+// Structured preferences, same fields as buildSemanticKeywords() in keywords.ts
+export interface PreferenceSearch {
+  query: string
+  activities?: string[]
+  budget?: number
+  numPax?: string
+  mbti?: string
+  spicy?: boolean
+}
+
+export async function queryActivitiesByPreferences(
+  preferences: PreferenceSearch,
+  topK: number = 20,
+  filters?: SearchFilters,
+  diversity?: number, // 0-1, MMR re-ranking on the bridge
+  collapse: boolean = false // best hit per venue, reposts and cross-posts dropped
+): Promise<Activity[]> {
+  try {
+    console.log(`🔍 Querying ChromaDB API by preferences: "${preferences.query}" (top ${topK})`)
+
+    // Facet keyword sets are embedded once on the bridge, not per request
+    const response = await fetch(`${CHROMADB_API_URL}/search/preferences`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        ...preferences,
+        n_results: topK,
+        filters,
+        diversity,
+        collapse
+      })
+    })
+
+    if (!response.ok) {
+      const error = await response.json()
+      throw new Error(`ChromaDB API error: ${error.detail || response.statusText}`)
+    }
+
+    const data = await response.json()
+
+    console.log(`✅ Retrieved ${data.count} activities from ChromaDB`)
+
+    return data.activities as Activity[]
+
+  } catch (error) {
+    console.error('❌ ChromaDB preference query error:', error)
+    throw new Error('Failed to query activities database')
+  }
+}
+
+export async function findSimilarActivities(
+  activityId: string,
+  topK: number = 20,
+  filters?: SearchFilters,
+  collapse: boolean = true // leave out the activity's other listings and reposts
+): Promise<Activity[]> {
+  try {
+    console.log(`🔁 Querying ChromaDB API for activities like ${activityId} (top ${topK})`)
+
+    // Searches from the activity's stored embedding, no embedding call
+    const response = await fetch(`${CHROMADB_API_URL}/activities/${encodeURIComponent(activityId)}/similar`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        n_results: topK,
+        filters,
+        collapse
+      })
+    })
+
+    if (!response.ok) {
+      const error = await response.json()
+      throw new Error(`ChromaDB API error: ${error.detail || response.statusText}`)
+    }
+
+    const data = await response.json()
+
+    console.log(`✅ Retrieved ${data.count} similar activities from ChromaDB`)
+
+    return data.activities as Activity[]
+
+  } catch (error) {
+    console.error('❌ ChromaDB similar query error:', error)
+    throw new Error('Failed to query activities database')
+  }
+}
+
+export interface BatchSearch {
+  query: string
+  n_results: number
+  filters?: SearchFilters
+}
+
+export async function queryActivitiesBatch(
+  searches: BatchSearch[],
+  dedupe: boolean = true
+): Promise<Activity[][]> {
+  try {
+    console.log(`🔍 Batch querying ChromaDB API: ${searches.length} queries`)
+
+    // One round trip to the bridge for all queries
+    const response = await fetch(`${CHROMADB_API_URL}/search/batch`, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify({
+        searches,
+        dedupe
+      })
+    })
+
+    if (!response.ok) {
+      const error = await response.json()
+      throw new Error(`ChromaDB API error: ${error.detail || response.statusText}`)
+    }
+
+    const data = await response.json()
+
+    return data.results.map((result: { activities: Activity[] }) => result.activities)
+
+  } catch (error) {
+    console.error('❌ ChromaDB batch query error:', error)
+    throw new Error('Failed to query activities database')
+  }
+}
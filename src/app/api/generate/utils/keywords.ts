@@ -1,4 +1,6 @@
 // Build semantic keywords from user preferences for vector search
+// The ChromaDB bridge mirrors these keyword lists for /search/preferences
+// (chromadb_api.py); keep both in sync
 
 interface SearchParams {
   query: string
@@ -10,6 +10,60 @@ from typing import Dict, List
 
 CHROMADB_API_URL = 'http://localhost:8001'
 
+# Preference profiles for the test cases below; loadtest_chroma_api.py replays them too.
+# numPax values are the group sizes keywords.ts knows.
+TEST_PROFILES = {
+    "romantic_date": {
+        'query': 'romantic dinner date with creative twist',
+        'activities': ['Cafes', 'Museums'],
+        'budget': 2,  # Moderate
+        'numPax': 'date',
+        'mbti': 'ENFP',
+        'spicy': False
+    },
+    "introvert": {
+        'query': 'Chill activities for introverts under $30',
+        'activities': ['Parks', 'Cafes'],
+        'budget': 0,  # Broke
+        'numPax': 'solo',
+        'mbti': 'INFP',
+        'spicy': False
+    },
+    "luxury": {
+        'query': 'Luxury dining and entertainment for special celebration',
+        'activities': ['Fine Dining', 'Bars'],
+        'budget': 4,  # Baller
+        'numPax': '6-7',
+        'mbti': 'ENTJ',
+        'spicy': True
+    },
+    "family": {
+        'query': 'Fun family day out with activities for kids',
+        'activities': ['Parks', 'Museums', 'Attractions'],
+        'budget': 2,  # Moderate
+        'numPax': '3-5',
+        'mbti': 'ESFJ',
+        'spicy': False
+    },
+    "adventure": {
+        'query': 'Unique outdoor adventures and thrilling experiences',
+        'activities': ['Sports', 'Outdoors'],
+        'budget': 3,  # Comfortable
+        'numPax': '3-5',
+        'mbti': 'ESTP',
+        'spicy': False
+    },
+    "culture": {
+        'query': 'Art galleries, cultural sites, and intellectual cafes',
+        'activities': ['Museums', 'Art', 'Cafes'],
+        'budget': 2,  # Moderate
+        'numPax': 'solo',
+        'mbti': 'INTJ',
+        'spicy': False
+    }
+}
+
+
 def build_semantic_keywords(params: Dict) -> str:
     """Build semantic keywords from user preferences (matches keywords.ts)"""
     keywords = []
@@ -36,10 +90,12 @@ def build_semantic_keywords(params: Dict) -> str:
 
     # Group size mapping
     pax_keywords = {
-        'solo': ['solo', 'alone', 'individual', 'self'],
+        'solo': ['solo', 'alone', 'individual'],
         'date': ['romantic', 'couple', 'date', 'intimate'],
-        'friends': ['group', 'friends', 'social', 'gathering'],
-        'family': ['family', 'kids', 'children', 'all-ages']
+        'double-date': ['double-date', 'couples', 'group'],
+        '3-5': ['small group', 'friends'],
+        '6-7': ['group', 'party'],
+        '8+': ['large group', 'party', 'gathering']
     }
     num_pax = params.get('numPax', '').lower()
     if num_pax in pax_keywords:
@@ -177,14 +233,7 @@ def main():
     print("TEST CASE 1: Romantic Date")
     print("🌹" * 40)
 
-    test_1 = {
-        'query': 'romantic dinner date with creative twist',
-        'activities': ['Cafes', 'Museums'],
-        'budget': 2,  # Moderate
-        'numPax': 'date',
-        'mbti': 'ENFP',
-        'spicy': False
-    }
+    test_1 = TEST_PROFILES['romantic_date']
     display_results(test_1, n_results=8)
 
     # Test Case 2: Budget Solo
@@ -192,14 +241,7 @@ def main():
     print("TEST CASE 2: Budget-Friendly Solo Activity")
     print("🧘" * 40)
 
-    test_2 = {
-        'query': 'Chill activities for introverts under $30',
-        'activities': ['Parks', 'Cafes'],
-        'budget': 0,  # Broke
-        'numPax': 'solo',
-        'mbti': 'INFP',
-        'spicy': False
-    }
+    test_2 = TEST_PROFILES['introvert']
     display_results(test_2, n_results=8)
 
     # Test Case 3: Luxury Group
@@ -207,14 +249,7 @@ def main():
     print("TEST CASE 3: Luxury Group Experience")
     print("💎" * 40)
 
-    test_3 = {
-        'query': 'Luxury dining and entertainment for special celebration',
-        'activities': ['Fine Dining', 'Bars'],
-        'budget': 4,  # Baller
-        'numPax': 'friends',
-        'mbti': 'ENTJ',
-        'spicy': True
-    }
+    test_3 = TEST_PROFILES['luxury']
     display_results(test_3, n_results=8)
 
     # Test Case 4: Family Day
@@ -222,14 +257,7 @@ def main():
     print("TEST CASE 4: Family-Friendly Day Out")
     print("👨‍👩‍👧‍👦" * 20)
 
-    test_4 = {
-        'query': 'Fun family day out with activities for kids',
-        'activities': ['Parks', 'Museums', 'Attractions'],
-        'budget': 2,  # Moderate
-        'numPax': 'family',
-        'mbti': 'ESFJ',
-        'spicy': False
-    }
+    test_4 = TEST_PROFILES['family']
     display_results(test_4, n_results=8)
 
     # Test Case 5: Adventure
@@ -237,14 +265,7 @@ def main():
     print("TEST CASE 5: Adventure Seeker")
     print("🏃" * 40)
 
-    test_5 = {
-        'query': 'Unique outdoor adventures and thrilling experiences',
-        'activities': ['Sports', 'Outdoors'],
-        'budget': 3,  # Comfortable
-        'numPax': 'friends',
-        'mbti': 'ESTP',
-        'spicy': False
-    }
+    test_5 = TEST_PROFILES['adventure']
     display_results(test_5, n_results=8)
 
     # Test Case 6: Cultural
@@ -252,14 +273,7 @@ def main():
     print("TEST CASE 6: Cultural Experience")
     print("🎨" * 40)
 
-    test_6 = {
-        'query': 'Art galleries, cultural sites, and intellectual cafes',
-        'activities': ['Museums', 'Art', 'Cafes'],
-        'budget': 2,  # Moderate
-        'numPax': 'solo',
-        'mbti': 'INTJ',
-        'spicy': False
-    }
+    test_6 = TEST_PROFILES['culture']
     display_results(test_6, n_results=8)
 
     # Comparison: Raw vs Enriched
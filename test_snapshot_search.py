@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Offline checks for the bridge's own search structures
+
+Runs the where clauses the bridge builds through a real ChromaDB
+collection, a memory-mapped snapshot of the same records and the NumPy
+vector engine over them, and expects identical answers from all three.
+Also pins BM25 keyword rankings whose order follows from the formula.
+Needs no running bridge, network or OpenAI key:
+
+    python -m pytest -q test_snapshot_search.py
+"""
+
+import json
+import math
+
+import chromadb
+import numpy as np
+import pytest
+
+from embedding_backends import HashedNgramBackend
+from filter_fields import filter_metadata, tag_key
+from lexical import BM25Index, lexical_text, tokenize
+from mmap_snapshot import SnapshotCollection, lexical_postings, write_snapshot
+from offer_dates import date_ordinal
+from vector_engine import NumpyVectorIndex
+
+OFFER_TYPES = ["activity", "event", "deal", "Activity"]
+SOURCE_TYPES = ["telegram", "instagram", ""]
+TAGS = ["food", "nightlife", "outdoor", "art", "family", "Date Night"]
+VENUES = ["Rooftop Bar", "Botanic Gardens", "Hawker Centre", "Art Museum", "Jazz Club", "Beach Club"]
+
+
+def make_records(count: int = 40) -> list:
+    """Deterministic catalogue covering every filter field, including missing prices and expiries"""
+    records = []
+    for i in range(count):
+        venue = VENUES[i % len(VENUES)]
+        records.append({
+            "title": f"{['Dinner', 'Drinks', 'Walk', 'Workshop', 'Show'][i % 5]} at {venue}",
+            "description": f"Offer {i} at the {venue.lower()}",
+            "venue_name": venue,
+            "offer_type": OFFER_TYPES[i % len(OFFER_TYPES)],
+            "source_type": SOURCE_TYPES[i % len(SOURCE_TYPES)],
+            "price": None if i % 7 == 0 else float(5 * (i % 12)),
+            "tags": [TAGS[i % len(TAGS)], TAGS[(i * 2 + 1) % len(TAGS)]] if i % 9 else [],
+            "validity_end": None if i % 5 == 0 else f"2026-{(i % 12) + 1:02d}-{(i % 27) + 1:02d}",
+            "search_keywords": f"{venue.lower()} singapore"
+        })
+    return records
+
+
+# Shapes build_where() in chromadb_api.py produces
+WHERE_CLAUSES = [
+    {"price": {"$gte": 20.0}},
+    {"price": {"$lte": 15.0}},
+    {"$and": [{"price": {"$gte": 10.0}}, {"price": {"$lte": 30.0}}]},
+    {"$or": [{"price": {"$lte": 10.0}}, {"has_price": False}]},
+    {"offer_type": {"$in": ["event", "deal"]}},
+    {"source_type": {"$in": ["instagram"]}},
+    {tag_key("food"): True},
+    {"$or": [{tag_key("art"): True}, {tag_key("Date Night"): True}]},
+    {"$and": [{tag_key("food"): True}, {tag_key("nightlife"): True}]},
+    {"validity_end_ord": {"$gte": date_ordinal("2026-06-15")}},
+    {"$and": [
+        {"$or": [{"price": {"$lte": 40.0}}, {"has_price": False}]},
+        {"offer_type": {"$in": ["activity"]}},
+        {"validity_end_ord": {"$gte": date_ordinal("2026-03-01")}}
+    ]},
+    {"offer_type": {"$nin": ["deal"]}},
+    {"source_type": {"$ne": "telegram"}},
+    {"price": {"$gt": 1000.0}},
+]
+
+
+@pytest.fixture(scope="module")
+def catalogue(tmp_path_factory):
+    records = make_records()
+    ids = [f"act_{i}" for i in range(len(records))]
+    backend = HashedNgramBackend(dimensions=64)
+    embeddings = np.asarray(backend.embed([f"{r['title']} {r['description']}" for r in records]), dtype=np.float32)
+    metadatas = [{"full_data": json.dumps(record), **filter_metadata(record)} for record in records]
+
+    client = chromadb.PersistentClient(path=str(tmp_path_factory.mktemp("chroma")))
+    collection = client.create_collection(name="search_fixture", embedding_function=None,
+                                          configuration={"hnsw": {"space": "l2"}})
+    collection.add(ids=ids, embeddings=embeddings.tolist(), metadatas=metadatas)
+
+    snapshot_dir = str(tmp_path_factory.mktemp("snapshot") / "snapshot")
+    write_snapshot(
+        snapshot_dir, ids, embeddings, metadatas,
+        [json.dumps(record).encode("utf-8") for record in records], "l2",
+        lexical_tokens=[tokenize(lexical_text(record)) for record in records]
+    )
+    snapshot = SnapshotCollection(snapshot_dir)
+
+    filter_fields = [{key: value for key, value in metadata.items() if key != "full_data"} for metadata in metadatas]
+    numpy_index = NumpyVectorIndex(collection, ids, embeddings, filter_fields, space="l2")
+
+    queries = np.asarray(backend.embed(["rooftop drinks", "art workshop", "dinner at the hawker centre"]), dtype=np.float32)
+    return {
+        "records": records, "ids": ids, "collection": collection, "snapshot": snapshot,
+        "numpy": numpy_index, "queries": queries
+    }
+
+
+@pytest.mark.parametrize("where", WHERE_CLAUSES, ids=[json.dumps(w, sort_keys=True) for w in WHERE_CLAUSES])
+def test_get_matches_chroma(catalogue, where):
+    expected = set(catalogue["collection"].get(where=where, include=[])["ids"])
+    assert set(catalogue["snapshot"].get(where=where, include=[])["ids"]) == expected
+
+
+@pytest.mark.parametrize("where", WHERE_CLAUSES, ids=[json.dumps(w, sort_keys=True) for w in WHERE_CLAUSES])
+@pytest.mark.parametrize("engine", ["snapshot", "numpy"])
+def test_query_matches_chroma(catalogue, where, engine):
+    chroma = catalogue["collection"].query(
+        query_embeddings=catalogue["queries"].tolist(), n_results=8, where=where, include=["distances"]
+    )
+    result = catalogue[engine].query(
+        query_embeddings=catalogue["queries"], n_results=8, where=where, include=["distances"]
+    )
+    for expected_ids, expected_distances, ids, distances in zip(
+        chroma["ids"], chroma["distances"], result["ids"], result["distances"]
+    ):
+        assert ids == expected_ids
+        assert distances == pytest.approx(expected_distances, rel=1e-4, abs=1e-5)
+
+
+def test_snapshot_filter_fields_match_records(catalogue):
+    for record, fields in zip(catalogue["records"], catalogue["snapshot"].filter_fields):
+        for key, value in filter_metadata(record).items():
+            assert fields[key] == value
+
+
+def bm25_score(tf: int, doc_length: int, avg_length: float, total: int, frequency: int,
+               k1: float = 1.2, b: float = 0.75) -> float:
+    idf = math.log(1 + (total - frequency + 0.5) / (frequency + 0.5))
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_length / avg_length))
+
+
+def test_bm25_term_frequency_ranks_first():
+    index = BM25Index().build({"once": "sushi ramen udon", "thrice": "sushi sushi sushi", "none": "pizza pasta salad"})
+    assert [activity_id for activity_id, _ in index.search("sushi", 10)] == ["thrice", "once"]
+
+
+def test_bm25_shorter_document_ranks_first():
+    index = BM25Index().build({"long": "jazz club night live music bar", "short": "jazz", "other": "hawker food"})
+    assert [activity_id for activity_id, _ in index.search("jazz", 10)] == ["short", "long"]
+
+
+def test_bm25_rare_term_outweighs_common_one():
+    index = BM25Index().build({
+        "common_1": "jazz night", "common_2": "jazz evening", "common_3": "jazz bar",
+        "rare": "brunch spot", "neither": "beach walk"
+    })
+    ranked = [activity_id for activity_id, _ in index.search("jazz brunch", 10)]
+    assert ranked[0] == "rare"
+    assert set(ranked[1:]) == {"common_1", "common_2", "common_3"}
+
+
+def test_bm25_score_matches_formula():
+    texts = {"a": "rooftop bar rooftop", "b": "rooftop garden walk tour", "c": "museum"}
+    index = BM25Index().build(texts)
+    avg_length = (3 + 4 + 1) / 3
+    expected = [
+        ("a", bm25_score(tf=2, doc_length=3, avg_length=avg_length, total=3, frequency=2)),
+        ("b", bm25_score(tf=1, doc_length=4, avg_length=avg_length, total=3, frequency=2))
+    ]
+    results = index.search("Rooftop!", 10)
+    assert [activity_id for activity_id, _ in results] == [activity_id for activity_id, _ in expected]
+    for (_, score), (_, expected_score) in zip(results, expected):
+        assert score == pytest.approx(expected_score)
+
+
+def test_bm25_title_outweighs_keywords():
+    texts = {
+        "keyword_only": lexical_text({"title": "Evening out", "venue_name": "Bar", "search_keywords": "omakase"}),
+        "in_title": lexical_text({"title": "Omakase dinner", "venue_name": "Bar", "search_keywords": "evening"})
+    }
+    assert BM25Index().build(texts).search("omakase", 10)[0][0] == "in_title"
+
+
+def test_bm25_removed_ids_are_skipped():
+    index = BM25Index().build({"a": "sushi", "b": "sushi bar", "c": "ramen"})
+    index.remove(["a"])
+    assert [activity_id for activity_id, _ in index.search("sushi", 10)] == ["b"]
+    assert len(index) == 2
+
+
+def test_bm25_snapshot_postings_rank_like_a_built_index(catalogue):
+    texts = {activity_id: lexical_text(record) for activity_id, record in zip(catalogue["ids"], catalogue["records"])}
+    built = BM25Index().build(texts)
+    snapshot = catalogue["snapshot"]
+    mapped = BM25Index().from_arrays(snapshot.ids, snapshot.rows, *snapshot.lexical)
+    for query in ["rooftop bar", "art museum workshop", "hawker dinner singapore", "nothing matches this"]:
+        assert mapped.search(query, 15) == built.search(query, 15)
+
+
+def test_lexical_postings_layout():
+    vocabulary, offsets, docs, counts, lengths = lexical_postings([["a", "b", "a"], ["b"], []])
+    assert vocabulary == ["a", "b"]
+    assert offsets.tolist() == [0, 1, 3]
+    assert docs.tolist() == [0, 0, 1]
+    assert counts.tolist() == [2, 1, 1]
+    assert lengths.tolist() == [3, 1, 0]
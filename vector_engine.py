@@ -0,0 +1,188 @@
+"""
+In-memory NumPy vector engine for the ChromaDB bridge
+
+Holds the collection's embeddings as one contiguous matrix and scores
+queries with batched matrix products instead of walking the HNSW graph.
+The matrix can be stored as float32 (exact), int8 (4x smaller) or packed
+sign bits (32x smaller); quantized scores only pick candidates, which are
+then re-ranked with exact float distances read back from the underlying
+collection, so returned order and distances are exact. int8 keeps recall
+near 1.0; binary trades recall for memory and wants a larger re-rank pool.
+
+NumpyVectorIndex answers the query() call of the chromadb Collection API
+and hands everything else (get, count, update) to the wrapped collection.
+Removed ids are skipped before scoring, so they never take a candidate slot.
+"""
+
+from typing import List, Optional
+
+import numpy as np
+
+from mmap_snapshot import WhereRows, space_distances
+
+QUANTIZATIONS = ("none", "int8", "binary")
+
+
+class NumpyVectorIndex:
+    """
+    Brute-force, optionally quantized vector index over a collection
+
+    quantization: none keeps float32 rows and is exact on its own; int8
+    scales each row to [-127, 127]; binary keeps one sign bit per
+    dimension. Quantized searches score every allowed row approximately,
+    keep rerank_multiplier * n_results candidates and re-rank those with
+    exact distances. Scoring runs over chunk_rows rows at a time so the
+    temporary float matrix stays small at any collection size.
+    """
+
+    def __init__(self, collection, ids: List[str], embeddings: np.ndarray, metadatas: List[dict],
+                 space: str = "l2", quantization: str = "none", rerank_multiplier: int = 4,
+                 chunk_rows: int = 8192):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization} (expected one of {', '.join(QUANTIZATIONS)})")
+
+        self.collection = collection
+        self.ids = list(ids)
+        self.space = space
+        self.quantization = quantization
+        self.rerank_multiplier = rerank_multiplier
+        self.chunk_rows = chunk_rows
+        self._rows = {activity_id: row for row, activity_id in enumerate(self.ids)}
+        self._where_rows = WhereRows(metadatas)
+
+        embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+        self.dimensions = embeddings.shape[1] if embeddings.ndim == 2 else 0
+        self._squared_norms = np.einsum("ij,ij->i", embeddings, embeddings)
+
+        if quantization == "int8":
+            scales = np.abs(embeddings).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self._matrix = np.round(embeddings / scales[:, None]).astype(np.int8)
+            self._scales = scales.astype(np.float32)
+        elif quantization == "binary":
+            self._matrix = np.packbits(embeddings > 0, axis=1)
+            self._scales = None
+        else:
+            self._matrix = embeddings
+            self._scales = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __getattr__(self, name):
+        # get, count, update, configuration, ... come from the wrapped collection
+        return getattr(self.collection, name)
+
+    def remove(self, ids: List[str]):
+        """Leave ids out of query results from now on"""
+        self._where_rows.remove([self._rows[activity_id] for activity_id in ids if activity_id in self._rows])
+
+    def embedding(self, activity_id: str) -> Optional[np.ndarray]:
+        """Float vector of one id, read from memory unless the matrix is quantized"""
+        row = self._rows.get(activity_id)
+        if row is None:
+            return None
+        if self.quantization == "none":
+            return self._matrix[row]
+        stored = self.collection.get(ids=[activity_id], include=["embeddings"])
+        if not stored['ids']:
+            return None
+        return np.asarray(stored['embeddings'][0], dtype=np.float32)
+
+    @property
+    def memory_bytes(self) -> int:
+        scales = self._scales.nbytes if self._scales is not None else 0
+        return self._matrix.nbytes + scales + self._squared_norms.nbytes
+
+    def stats(self) -> dict:
+        return {
+            "engine": "numpy",
+            "quantization": self.quantization,
+            "vectors": len(self.ids),
+            "dimensions": self.dimensions,
+            "memory_bytes": self.memory_bytes
+        }
+
+    def _approximate(self, queries: np.ndarray, rows: np.ndarray) -> np.ndarray:
+        """Distances (or a monotonic stand-in) from each query to each row, lower is closer"""
+        if self.quantization == "binary":
+            # Asymmetric: the float query against +-1 signs ranks far better
+            # than Hamming distance between two sign vectors
+            signs = np.unpackbits(self._matrix[rows], axis=1, count=self.dimensions).astype(np.float32)
+            signs = signs * 2.0 - 1.0
+            return -(queries @ signs.T)
+
+        matrix = self._matrix[rows].astype(np.float32)
+        if self._scales is not None:
+            matrix *= self._scales[rows][:, None]
+        return space_distances(queries, matrix, self._squared_norms[rows], self.space)
+
+    def _exact(self, queries: np.ndarray, candidate_rows: List[np.ndarray]):
+        """Exact distances for each query's candidates, plus the float rows that were read"""
+        if self.quantization == "none":
+            return [
+                space_distances(query[None, :], self._matrix[rows], self._squared_norms[rows], self.space)[0]
+                for query, rows in zip(queries, candidate_rows)
+            ], None
+
+        # Float vectors live in the collection, not in memory
+        needed = np.unique(np.concatenate(candidate_rows)) if candidate_rows else np.zeros(0, dtype=np.int64)
+        stored = self.collection.get(ids=[self.ids[row] for row in needed], include=["embeddings"])
+        vectors = {self._rows[activity_id]: vector for activity_id, vector in zip(stored['ids'], stored['embeddings'])}
+        distances = []
+        for query, rows in zip(queries, candidate_rows):
+            matrix = np.asarray([vectors[row] for row in rows], dtype=np.float32).reshape(len(rows), self.dimensions)
+            distances.append(space_distances(query[None, :], matrix, self._squared_norms[rows], self.space)[0])
+        return distances, vectors
+
+    def query(self, query_embeddings, n_results: int = 10, where: Optional[dict] = None,
+              ids: Optional[List[str]] = None, include: Optional[List[str]] = None) -> dict:
+        include = ["distances"] if include is None else include
+        queries = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dimensions)
+        allowed = self._where_rows.select(self._rows, ids, where, live=True)
+        if allowed is None:
+            allowed = np.arange(len(self.ids))
+
+        k = min(n_results, len(allowed))
+        pool = k if self.quantization == "none" else min(len(allowed), k * self.rerank_multiplier)
+
+        candidate_rows = []
+        if k > 0:
+            best = [(np.zeros(0), np.zeros(0, dtype=np.int64)) for _ in range(len(queries))]
+            for start in range(0, len(allowed), self.chunk_rows):
+                rows = allowed[start:start + self.chunk_rows]
+                scores = self._approximate(queries, rows)
+                for i, query_scores in enumerate(scores):
+                    merged_scores = np.concatenate([best[i][0], query_scores])
+                    merged_rows = np.concatenate([best[i][1], rows])
+                    if len(merged_scores) > pool:
+                        keep = np.argpartition(merged_scores, pool - 1)[:pool]
+                        merged_scores, merged_rows = merged_scores[keep], merged_rows[keep]
+                    best[i] = (merged_scores, merged_rows)
+            candidate_rows = [rows for _, rows in best]
+
+        exact, vectors = self._exact(queries, candidate_rows) if candidate_rows else ([], None)
+
+        results = {"ids": [], "distances": [], "embeddings": [], "metadatas": []}
+        for i in range(len(queries)):
+            if not candidate_rows:
+                hit_rows, hit_distances = [], []
+            else:
+                order = np.argsort(exact[i], kind="stable")[:k]
+                hit_rows = candidate_rows[i][order].tolist()
+                hit_distances = exact[i][order].tolist()
+
+            results["ids"].append([self.ids[row] for row in hit_rows])
+            results["distances"].append(hit_distances)
+            if "embeddings" in include:
+                if vectors is None:
+                    rows_matrix = self._matrix[hit_rows]
+                else:
+                    rows_matrix = np.asarray([vectors[row] for row in hit_rows], dtype=np.float32)
+                results["embeddings"].append(rows_matrix.reshape(len(hit_rows), self.dimensions))
+            if "metadatas" in include:
+                stored = self.collection.get(ids=results["ids"][-1], include=["metadatas"])
+                by_id = dict(zip(stored['ids'], stored['metadatas']))
+                results["metadatas"].append([by_id.get(activity_id) for activity_id in results["ids"][-1]])
+
+        return {field: values for field, values in results.items() if field == "ids" or field in include}